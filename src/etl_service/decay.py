@@ -0,0 +1,113 @@
+import math
+import os
+from typing import Optional
+
+HALF_LIFE_DAYS = float(os.getenv("RATING_HALF_LIFE_DAYS", "90"))
+DECAY_RATE = math.log(2) / (HALF_LIFE_DAYS * 24 * 60 * 60)
+# Ratings timestamped up to this many seconds before the watermark are still folded in if they were not
+# yet, e.g. ratings sharing the watermark's second but missing from the previous extraction.
+WATERMARK_LOOKBACK_SECONDS = float(os.getenv("RATING_WATERMARK_LOOKBACK_SECONDS", "86400"))
+# Decimal places of the decayed scores. Moving the sums forward rescales both of them by the same factor,
+# which changes the last bits of their ratio; rounding keeps unchanged scores identical between runs.
+DECAYED_SCORE_DIGITS = 6
+
+
+def empty_decay_state() -> dict:
+    """
+    Returns the decay state used before any rating has been processed.
+
+    Returns:
+    - dict:
+        A dictionary with the following keys:
+        - 'as_of': The unix time the decayed sums are expressed at, or None.
+        - 'watermark': The latest rating timestamp already folded into the sums, or None.
+        - 'recent_ratings': The IDs of the ratings already folded into the sums that are timestamped less
+          than WATERMARK_LOOKBACK_SECONDS before the watermark.
+        - 'councillors': A dictionary of councillor_id (str) to its 'decayed_sum' and 'decayed_weight'.
+    """
+    return {"as_of": None, "watermark": None, "recent_ratings": [], "councillors": {}}
+
+
+def update_decay_state(
+    state: dict,
+    increments: dict,
+    as_of: float,
+    watermark: Optional[float],
+    recent_ratings: Optional[list] = None,
+) -> dict:
+    """
+    Moves the decayed sums of a decay state forward to as_of and folds new ratings into them.
+
+    Parameters:
+    - state: dict
+        The previous decay state, as returned by empty_decay_state or a former update_decay_state call.
+    - increments: dict
+        A dictionary of councillor_id to a ('decayed_sum', 'decayed_weight') tuple computed over the ratings
+        not yet folded into the state, already decayed to as_of.
+    - as_of: float
+        The unix time the returned sums are expressed at.
+    - watermark: Optional[float]
+        The latest rating timestamp contained in increments. The watermark never moves back: the previous
+        one is kept when it is later or watermark is None.
+    - recent_ratings: Optional[list]
+        The IDs of the folded ratings timestamped within WATERMARK_LOOKBACK_SECONDS of the new watermark.
+        The previous ones are kept when None.
+
+    Returns:
+    - dict:
+        The new decay state. The input state is left untouched.
+    """
+    previous_as_of = state.get("as_of")
+    factor = (
+        1.0
+        if previous_as_of is None
+        else math.exp(-DECAY_RATE * max(as_of - previous_as_of, 0.0))
+    )
+
+    councillors = {
+        councillor_id: {
+            "decayed_sum": entry["decayed_sum"] * factor,
+            "decayed_weight": entry["decayed_weight"] * factor,
+        }
+        for councillor_id, entry in state.get("councillors", {}).items()
+    }
+    for councillor_id, (decayed_sum, decayed_weight) in increments.items():
+        entry = councillors.setdefault(
+            str(councillor_id), {"decayed_sum": 0.0, "decayed_weight": 0.0}
+        )
+        entry["decayed_sum"] += decayed_sum
+        entry["decayed_weight"] += decayed_weight
+
+    previous_watermark = state.get("watermark")
+    if watermark is None or (
+        previous_watermark is not None and previous_watermark > watermark
+    ):
+        watermark = previous_watermark
+    return {
+        "as_of": as_of,
+        "watermark": watermark,
+        "recent_ratings": state.get("recent_ratings")
+        if recent_ratings is None
+        else recent_ratings,
+        "councillors": councillors,
+    }
+
+
+def decayed_score(state: dict, councillor_id: object) -> Optional[float]:
+    """
+    Returns the time-decayed average rating of a councillor.
+
+    Parameters:
+    - state: dict
+        The decay state holding the councillor's decayed sums.
+    - councillor_id: object
+        The ID of the councillor.
+
+    Returns:
+    - Optional[float]: The decayed average rating rounded to DECAYED_SCORE_DIGITS decimal places, or None
+        if the councillor has no rating yet.
+    """
+    entry = state["councillors"].get(str(councillor_id))
+    if not entry or not entry["decayed_weight"]:
+        return None
+    return round(entry["decayed_sum"] / entry["decayed_weight"], DECAYED_SCORE_DIGITS)
@@ -1,4 +1,8 @@
+import json
 import os
+import tempfile
+import time
+from typing import Optional
 
 import requests  # type: ignore
 from dotenv import load_dotenv
@@ -7,9 +11,16 @@ from base_logger import logger
 
 load_dotenv()
 
+EXTRACT_CACHE_DIR = os.getenv(
+    "EXTRACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "etl_extract_cache")
+)
+EXTRACT_RETRIES = int(os.getenv("EXTRACT_RETRIES", "2"))
+EXTRACT_RETRY_DELAY = float(os.getenv("EXTRACT_RETRY_DELAY", "1"))
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "10"))
+
 
 def get_api_data(url: str) -> dict:
-    response = requests.get(url)
+    response = requests.get(url, timeout=EXTRACT_TIMEOUT)
     try:
         response.raise_for_status()
     except requests.HTTPError:
@@ -26,5 +37,80 @@ urls = {
     "rating": f"{os.getenv('BASE_URL')}/rating",
 }
 
+# Number of retries of every endpoint, overridable per endpoint with e.g. EXTRACT_RETRIES_RATING.
+retry_budgets = {
+    key: int(os.getenv(f"EXTRACT_RETRIES_{key.upper()}", str(EXTRACT_RETRIES)))
+    for key in urls
+}
+
+# Outcome of the last extraction of every endpoint, published by load.py.
+extract_status: dict = {}
+
+
+def get_api_data_with_fallback(key: str, url: str) -> dict:
+    """
+    Fetches an endpoint with get_api_data, retrying it up to its retry budget, and falls back to the
+    last payload successfully fetched from it when every attempt fails.
+
+    Parameters:
+    - key: str
+        The name of the endpoint, e.g. 'rating'.
+    - url: str
+        The URL of the endpoint.
+
+    Returns:
+    - dict: The fresh payload, or the last successful one. extract_status[key] records which one and
+        when it was fetched.
+
+    Raises:
+    - requests.RequestException: If every attempt failed and no payload was ever fetched from the endpoint.
+    """
+    retries = retry_budgets.get(key, EXTRACT_RETRIES)
+    for attempt in range(retries):
+        try:
+            return _fetch_fresh_payload(key, url)
+        except requests.RequestException as error:
+            logger.warning(f"Attempt {attempt + 1} to fetch {key} failed: {error}")
+            time.sleep(EXTRACT_RETRY_DELAY * 2**attempt)
+
+    try:
+        return _fetch_fresh_payload(key, url)
+    except requests.RequestException:
+        cached = _read_cached_payload(key)
+        if cached is None:
+            raise
+        logger.warning(f"Using the {key} payload fetched at {cached['fetched_at']}")
+        extract_status[key] = {"stale": True, "fetched_at": cached["fetched_at"]}
+        return cached["data"]
+
+
+def _fetch_fresh_payload(key: str, url: str) -> dict:
+    data = get_api_data(url)
+    fetched_at = time.time()
+    _write_cached_payload(key, {"fetched_at": fetched_at, "data": data})
+    extract_status[key] = {"stale": False, "fetched_at": fetched_at}
+    return data
+
+
+def _cached_payload_path(key: str) -> str:
+    return os.path.join(EXTRACT_CACHE_DIR, f"{key}.json")
+
+
+def _read_cached_payload(key: str) -> Optional[dict]:
+    try:
+        with open(_cached_payload_path(key), encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached_payload(key: str, payload: dict) -> None:
+    os.makedirs(EXTRACT_CACHE_DIR, exist_ok=True)
+    temporary_path = f"{_cached_payload_path(key)}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as cache_file:
+        json.dump(payload, cache_file)
+    os.replace(temporary_path, _cached_payload_path(key))
+
+
 if __name__ == "__main__":
-    data = {key: get_api_data(val) for key, val in urls.items()}
+    data = {key: get_api_data_with_fallback(key, val) for key, val in urls.items()}
@@ -1,10 +1,26 @@
+import hashlib
 import json
+import os
+from typing import Iterable
 
 import redis  # type: ignore
+from pyspark.sql import Row, SparkSession
+from pyspark.sql import functions as F
 
 from base_logger import logger
+from decay import empty_decay_state
+from extract import extract_status
 from redis_connector import get_redis_client
-from transform import data_transformations
+from snapshot import remove_ranking_snapshot, write_ranking_snapshot
+from transform import councillor_ratings, data_transformations
+
+DECAY_STATE_KEY = "etl:decay_state"
+EXTRACT_STATUS_KEY = "etl:extract_status"
+RANKING_LIST_PREFIX = "ranking:"
+RANKING_DIGESTS_KEY = "rankings:digests"
+RANKING_CHANGES_CHANNEL = "rankings:changes"
+RANKING_SNAPSHOT_PATH = os.getenv("RANKING_SNAPSHOT_PATH")
+ETL_SHARDS = int(os.getenv("ETL_SHARDS", "0"))
 
 
 def load_data_to_redis(
@@ -14,6 +30,10 @@ def load_data_to_redis(
     Stores specializations_dfs that is given by data_transformations function in Redis,
     using redis_client that is given by get_redis_client function.
 
+    Every specialization is stored both as a JSON document under its own key and as a Redis list under
+    RANKING_LIST_PREFIX + specialization, so that a page of the ranking can be read with LRANGE. Only the
+    specializations whose ranking changed are written, see store_rankings.
+
     Parameters:
     - redis_client: redis.client.Redis
         redis_client object given by get_redis_client function.
@@ -29,10 +49,185 @@ def load_data_to_redis(
     dict: The same input dictionary of specializations dataframes.
     """
 
+    changed = store_rankings(redis_client, specializations_dfs)
+    logger.info(f"Data Stored in Redis, {len(changed)} specializations changed.")
+    return specializations_dfs
+
+
+def store_rankings(redis_client: redis.client.Redis, specializations_dfs: dict) -> list:
+    """
+    Stores every specialization ranking that changed as a JSON document and as a Redis list.
+
+    A digest of every stored ranking is kept in the RANKING_DIGESTS_KEY hash to detect the rankings that
+    did not change, which are not written again. The name of every changed specialization is published
+    on RANKING_CHANGES_CHANNEL, for the matching service to drop only the cached rankings that changed.
+
+    Parameters:
+    - redis_client: redis.client.Redis
+        redis_client object given by get_redis_client function.
+    - specializations_dfs: dict
+        A dictionary containing specializations (key) and their councillor records (value).
+
+    Returns:
+    list: The specializations whose ranking changed.
+    """
+    changed = []
     for key, val in specializations_dfs.items():
+        digest = hashlib.sha256(json.dumps(val).encode("utf-8")).hexdigest()
+        if redis_client.hget(RANKING_DIGESTS_KEY, key) == digest.encode("utf-8"):
+            continue
         redis_client.set(key, json.dumps(val, indent=2))
-    logger.info("Data Stored in Redis.")
-    return specializations_dfs
+        store_ranking_list(redis_client, key, val)
+        redis_client.hset(RANKING_DIGESTS_KEY, key, digest)
+        redis_client.publish(RANKING_CHANGES_CHANNEL, key)
+        changed.append(key)
+    return changed
+
+
+def store_partition(rows: Iterable[Row]) -> None:
+    """
+    Stores the rankings of a partition of the DataFrame given by councillor_ratings in Redis.
+
+    This function runs on the executors: the partition must hold whole specializations, sorted by
+    specialization, then by descending average_value and councillor_id, as arranged by load_data_sharded.
+
+    Parameters:
+    - rows: Iterable[Row]
+        The rows of the partition.
+    """
+    rankings: dict = {}
+    for row in rows:
+        record = row.asDict()
+        specialization = record.pop("specialization")
+        rankings.setdefault(specialization, []).append(json.dumps(record))
+    if rankings:
+        store_rankings(get_redis_client(), rankings)
+
+
+def load_data_sharded(decay_state: dict, shards: int) -> None:
+    """
+    Calculates and stores the specialization rankings with the work split by specialization into shards
+    partitions, each written to Redis by the executor that computed it, so that no ranking goes through
+    the driver.
+
+    Parameters:
+    - decay_state: dict
+        The decay state persisted by the previous run. It is updated in place with this run's ratings.
+    - shards: int
+        The number of partitions the specializations are spread over.
+
+    Notes:
+    - The executors import redis_connector and base_logger, so on a cluster these modules must be shipped
+      with the job (e.g. spark-submit --py-files).
+    - No ranking snapshot is written, as no process holds every ranking, and the caller must remove the
+      snapshot of a previous run, which the matching service would otherwise keep serving.
+    - The decay state is still held by the driver: it is read from and written to Redis as a whole, and
+      councillor_ratings collects this run's decayed increments and broadcasts one decayed score per
+      councillor. Its size grows with the number of councillors, not with the size of the rankings.
+    """
+    spark = SparkSession.builder.getOrCreate()
+
+    (
+        councillor_ratings(spark, decay_state)
+        .repartition(shards, "specialization")
+        .sortWithinPartitions(
+            "specialization", F.desc("average_value"), "councillor_id"
+        )
+        .foreachPartition(store_partition)
+    )
+
+    spark.stop()
+    logger.info(f"Data Stored in Redis from {shards} shards.")
+
+
+def store_ranking_list(
+    redis_client: redis.client.Redis, specialization: str, ranking: list
+) -> None:
+    """
+    Replaces the ranking list of a specialization atomically.
+
+    Parameters:
+    - redis_client: redis.client.Redis
+        redis_client object given by get_redis_client function.
+    - specialization: str
+        The specialization the ranking belongs to.
+    - ranking: list
+        The councillor records of the specialization, best rated first.
+    """
+    pipeline = redis_client.pipeline(transaction=True)
+    pipeline.delete(f"{RANKING_LIST_PREFIX}{specialization}")
+    if ranking:
+        pipeline.rpush(f"{RANKING_LIST_PREFIX}{specialization}", *ranking)
+    pipeline.execute()
+
+
+def load_decay_state(redis_client: redis.client.Redis) -> dict:
+    """
+    Reads the decay state persisted by the previous ETL run.
+
+    Parameters:
+    - redis_client: redis.client.Redis
+        redis_client object given by get_redis_client function.
+
+    Returns:
+    dict: The stored decay state, or an empty one on the first run.
+    """
+    stored_state = redis_client.get(DECAY_STATE_KEY)
+    if stored_state is None:
+        return empty_decay_state()
+    return json.loads(stored_state)
+
+
+def store_decay_state(redis_client: redis.client.Redis, decay_state: dict) -> None:
+    """
+    Persists the decay state updated by data_transformations for the next ETL run.
+
+    Parameters:
+    - redis_client: redis.client.Redis
+        redis_client object given by get_redis_client function.
+    - decay_state: dict
+        The decay state to persist.
+    """
+    redis_client.set(DECAY_STATE_KEY, json.dumps(decay_state))
+    logger.info("Decay state stored in Redis.")
+
+
+def store_extract_status(redis_client: redis.client.Redis, status: dict) -> None:
+    """
+    Publishes the outcome of the extraction of every endpoint, flagging the endpoints whose last
+    successful payload had to be reused.
+
+    Parameters:
+    - redis_client: redis.client.Redis
+        redis_client object given by get_redis_client function.
+    - status: dict
+        A dictionary of endpoint name to its 'stale' flag and 'fetched_at' time, as recorded in
+        extract.extract_status.
+    """
+    redis_client.set(EXTRACT_STATUS_KEY, json.dumps(status))
+    stale_endpoints = [key for key, value in status.items() if value["stale"]]
+    if stale_endpoints:
+        logger.warning(f"Stale data used for: {', '.join(stale_endpoints)}")
+
 
 if __name__ == "__main__":
-    load_data_to_redis(get_redis_client(), data_transformations())
+    client = get_redis_client()
+    state = load_decay_state(client)
+    if ETL_SHARDS > 0:
+        load_data_sharded(state, ETL_SHARDS)
+        if RANKING_SNAPSHOT_PATH and remove_ranking_snapshot(RANKING_SNAPSHOT_PATH):
+            logger.warning("Stale ranking snapshot removed, it is not written when ETL_SHARDS is set.")
+    else:
+        specializations = data_transformations(state)
+        load_data_to_redis(client, specializations)
+    store_decay_state(client, state)
+    store_extract_status(client, extract_status)
+    # Written last, so that a failing snapshot does not lose the decay state and extract status.
+    if ETL_SHARDS <= 0 and RANKING_SNAPSHOT_PATH:
+        try:
+            write_ranking_snapshot(RANKING_SNAPSHOT_PATH, specializations)
+            logger.info("Ranking snapshot written.")
+        except (OSError, ValueError) as error:
+            # The matching service prefers the snapshot, so it must not keep serving the previous one.
+            remove_ranking_snapshot(RANKING_SNAPSHOT_PATH)
+            logger.error(f"Could not write the ranking snapshot, previous one removed: {error!r}")
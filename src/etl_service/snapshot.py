@@ -0,0 +1,128 @@
+import json
+import math
+import os
+import struct
+import tempfile
+
+# Layout of a ranking snapshot, read by the matching service (src/matching_service/ranking_snapshot.py):
+# a header, one index entry per specialization, the fixed-width councillor records of every
+# specialization, best rated first, then the string table of the attribute values. All integers and
+# floats are little-endian.
+SNAPSHOT_MAGIC = b"CRSNAP02"
+HEADER_FORMAT = "<8sIQI"  # magic, number of specializations, offset and number of strings
+INDEX_FORMAT = "<64sQI"  # utf-8 specialization, offset of its first record, number of records
+# councillor_id, average_value, decayed_value (NaN if None), rating_count, then the string code of
+# each of SNAPSHOT_ATTRIBUTES (NO_VALUE if missing)
+RECORD_FORMAT = "<qddIII"
+STRING_FORMAT = "<I"  # length of the utf-8 JSON encoded value following it
+SNAPSHOT_ATTRIBUTES = ("language", "availability")
+NO_VALUE = 0xFFFFFFFF
+
+
+def encode_record(record: dict, strings: dict) -> bytes:
+    """
+    Packs a councillor record given by data_transformations into a fixed-width snapshot record.
+
+    Parameters:
+    - record: dict
+        The councillor record. Its 'councillor_id' must be an integer.
+    - strings: dict
+        The string table being built, mapping every JSON encoded attribute value to its code. The
+        attribute values of the record missing from it are added.
+
+    Returns:
+    - bytes: The packed record.
+    """
+    codes = []
+    for attribute in SNAPSHOT_ATTRIBUTES:
+        if record.get(attribute) is None:
+            codes.append(NO_VALUE)
+        else:
+            codes.append(strings.setdefault(json.dumps(record[attribute]), len(strings)))
+    decayed_value = record.get("decayed_value")
+    return struct.pack(
+        RECORD_FORMAT,
+        int(record["councillor_id"]),
+        float(record["average_value"]),
+        math.nan if decayed_value is None else float(decayed_value),
+        int(record.get("rating_count", 0)),
+        *codes,
+    )
+
+
+def write_ranking_snapshot(path: str, specializations_dfs: dict) -> None:
+    """
+    Writes the rankings of every specialization into an immutable snapshot file.
+
+    The snapshot is written to a temporary file of the same directory and renamed over path, so that
+    readers mapping path always see either the previous or the new snapshot as a whole.
+
+    Parameters:
+    - path: str
+        The path of the snapshot file.
+    - specializations_dfs: dict
+        A dictionary containing specializations (key) and their councillor records as JSON strings (value),
+        as given by data_transformations.
+    """
+    header_size = struct.calcsize(HEADER_FORMAT)
+    index_size = struct.calcsize(INDEX_FORMAT)
+    record_size = struct.calcsize(RECORD_FORMAT)
+
+    index = []
+    records: list = []
+    strings: dict = {}
+    offset = header_size + index_size * len(specializations_dfs)
+    for specialization, ranking in specializations_dfs.items():
+        name = specialization.encode("utf-8")
+        if len(name) > 64:
+            raise ValueError(f"Specialization name too long for a snapshot: {specialization}")
+        index.append(struct.pack(INDEX_FORMAT, name, offset, len(ranking)))
+        records.extend(encode_record(json.loads(item), strings) for item in ranking)
+        offset += record_size * len(ranking)
+
+    string_table = []
+    for string in strings:  # in code order
+        value = string.encode("utf-8")
+        string_table.append(struct.pack(STRING_FORMAT, len(value)) + value)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as snapshot_file:
+            snapshot_file.write(
+                struct.pack(
+                    HEADER_FORMAT,
+                    SNAPSHOT_MAGIC,
+                    len(specializations_dfs),
+                    offset,
+                    len(strings),
+                )
+            )
+            snapshot_file.writelines(index)
+            snapshot_file.writelines(records)
+            snapshot_file.writelines(string_table)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def remove_ranking_snapshot(path: str) -> bool:
+    """
+    Removes the snapshot file at path, if any, so that readers stop serving rankings from it.
+
+    Parameters:
+    - path: str
+        The path of the snapshot file.
+
+    Returns:
+    - bool: Whether a snapshot file was removed.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
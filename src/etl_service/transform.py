@@ -1,8 +1,45 @@
-from pyspark.sql import DataFrame, SparkSession
-from pyspark.sql import functions as F
 import json
+import os
+import time
+from typing import Optional
+
+from pyspark.sql import DataFrame, SparkSession, Window
+from pyspark.sql import functions as F
+
 from base_logger import logger
-from extract import get_api_data, urls
+from decay import (
+    DECAY_RATE,
+    WATERMARK_LOOKBACK_SECONDS,
+    decayed_score,
+    empty_decay_state,
+    update_decay_state,
+)
+from extract import get_api_data_with_fallback, urls
+
+RATING_TIMESTAMP_COLUMN = os.getenv("RATING_TIMESTAMP_COLUMN", "created_at")
+COUNCILLOR_ATTRIBUTES = ("language", "availability")
+
+# Columns of every endpoint used by joined_data; the others are pruned before the joins.
+USED_COLUMNS = {
+    "appointment": ("id", "patient_id"),
+    "councillor": ("id", "specialization", *COUNCILLOR_ATTRIBUTES),
+    "patient_councillor": ("patient_id", "councillor_id"),
+    "rating": ("id", "appointment_id", "value", RATING_TIMESTAMP_COLUMN),
+}
+# Columns identifying a row of every endpoint, used to drop duplicated rows.
+PRIMARY_KEYS = {
+    "appointment": ("id",),
+    "councillor": ("id",),
+    "patient_councillor": ("patient_id", "councillor_id"),
+    "rating": ("id",),
+}
+# Columns without which a row cannot be deduplicated or take part in the joins.
+REQUIRED_COLUMNS = {
+    "appointment": ("id", "patient_id"),
+    "councillor": ("id", "specialization"),
+    "patient_councillor": ("patient_id", "councillor_id"),
+    "rating": ("id", "appointment_id", "value"),
+}
 
 
 def fetch_all_data(spark: SparkSession) -> dict:
@@ -19,7 +56,7 @@ def fetch_all_data(spark: SparkSession) -> dict:
         'councillor', 'patient_councillor', and 'rating', and the values are the corresponding Spark DataFrames.
 
     Preconditions:
-    - The `get_api_data()` function should be implemented to fetch data from the API URLs.
+    - The `get_api_data_with_fallback()` function should be implemented to fetch data from the API URLs.
     - The `urls` dictionary should contain the appropriate API URLs.
     - The `spark` parameter should be a valid SparkSession object.
 
@@ -29,7 +66,7 @@ def fetch_all_data(spark: SparkSession) -> dict:
     """
     dataframes = {}
     for key, url in urls.items():
-        data = get_api_data(url)
+        data = get_api_data_with_fallback(key, url)
         # data = json.dumps(data)
         dataframes[key] = spark.read.json(
             spark.sparkContext.parallelize([json.dumps(data)])
@@ -39,6 +76,96 @@ def fetch_all_data(spark: SparkSession) -> dict:
     # print(dataframes)
     return dataframes
 
+
+def validated_dataframes(dataframes: dict) -> tuple[dict, dict]:
+    """
+    Prunes, validates and deduplicates the DataFrames given by fetch_all_data before they are joined.
+
+    For every DataFrame, the columns outside USED_COLUMNS are dropped, rows missing one of their
+    REQUIRED_COLUMNS are discarded and rows repeating PRIMARY_KEYS are deduplicated (on the whole row when
+    the endpoint has no primary key column), see deduplicated. Ratings whose value is not a number and
+    patient_councillor rows pointing to an unknown councillor are discarded too.
+
+    The validated DataFrames are cached, so that counting their rows does not compute them again for
+    the joins.
+
+    Parameters:
+    - dataframes: dict
+        The DataFrames given by fetch_all_data.
+
+    Returns:
+    - tuple[dict, dict]:
+        The validated DataFrames, with the same keys, and a dictionary of the number of rows discarded
+        from every DataFrame.
+    """
+    validated = {}
+    for key, dataframe in dataframes.items():
+        columns = [column for column in USED_COLUMNS[key] if column in dataframe.columns]
+        validated_df = dataframe.select(*columns)
+        if key == "rating" and "value" in columns:
+            # Cast before deduplicating, so that a rating whose value is not a number is discarded
+            # like a missing one instead of being kept over a valid duplicate.
+            validated_df = validated_df.withColumn("value", F.col("value").cast("double"))
+
+        required_columns = [
+            column for column in REQUIRED_COLUMNS[key] if column in columns
+        ]
+        if required_columns:
+            validated_df = validated_df.dropna(subset=required_columns)
+
+        primary_key = [column for column in PRIMARY_KEYS[key] if column in columns]
+        validated[key] = deduplicated(validated_df, primary_key)
+
+    validated["patient_councillor"] = validated["patient_councillor"].join(
+        validated["councillor"].select(F.col("id").alias("councillor_id")),
+        "councillor_id",
+        "left_semi",
+    )
+
+    discarded = {}
+    for key, dataframe in dataframes.items():
+        validated[key] = validated[key].cache()
+        discarded[key] = dataframe.count() - validated[key].count()
+    logger.info(f"Invalid or duplicated rows discarded: {discarded}")
+    return validated, discarded
+
+
+def deduplicated(dataframe: DataFrame, primary_key: list) -> DataFrame:
+    """
+    Keeps a single row of every primary key value, picked the same way on every run.
+
+    The latest row by RATING_TIMESTAMP_COLUMN is kept when the DataFrame has that column, ties and
+    DataFrames without it being settled by the greatest values of the other columns.
+
+    Parameters:
+    - dataframe: DataFrame
+        The DataFrame to deduplicate.
+    - primary_key: list
+        The columns identifying a row. The whole row is deduplicated when empty.
+
+    Returns:
+    - DataFrame: The DataFrame without duplicated rows.
+    """
+    if not primary_key:
+        return dataframe.dropDuplicates()
+
+    other_columns = [column for column in dataframe.columns if column not in primary_key]
+    if RATING_TIMESTAMP_COLUMN in other_columns:
+        other_columns.remove(RATING_TIMESTAMP_COLUMN)
+        other_columns.insert(0, RATING_TIMESTAMP_COLUMN)
+    if not other_columns:
+        return dataframe.dropDuplicates(primary_key)
+
+    window = Window.partitionBy(*primary_key).orderBy(
+        *[F.col(column).desc_nulls_last() for column in other_columns]
+    )
+    return (
+        dataframe.withColumn("_row_number", F.row_number().over(window))
+        .filter(F.col("_row_number") == 1)
+        .drop("_row_number")
+    )
+
+
 def joined_data(spark: SparkSession) -> DataFrame:
     """
     Performs data joining based on appointment, councillor, patient-councillor, and rating DataFrames.
@@ -53,23 +180,43 @@ def joined_data(spark: SparkSession) -> DataFrame:
         - 'councillor_id': The ID of the councillor associated with the appointment.
         - 'specialization': The specialization of the councillor.
         - 'value': The rating value associated with the appointment.
+        - 'rating_id': The ID of the rating.
+        - 'rated_at': The unix time of the rating, read from the RATING_TIMESTAMP_COLUMN column (null when
+          the rating endpoint does not provide it).
+        - The COUNCILLOR_ATTRIBUTES columns the councillor endpoint provides, used by the matching service
+          to filter councillors.
 
     Preconditions:
     - The `fetch_all_data()` function should be implemented and accessible to retrieve the required DataFrames.
     - The `spark` parameter should be a valid SparkSession object.
 
+    Notes:
+    - The DataFrames are cleaned by validated_dataframes before being joined.
+
     Returns:
     - DataFrame:
         The joined DataFrame containing the desired columns.
     """
 
-    dataframes = fetch_all_data(spark)
+    dataframes, _ = validated_dataframes(fetch_all_data(spark))
 
     appointment_df = dataframes["appointment"]
     councillor_df = dataframes["councillor"]
     patient_councillor_df = dataframes["patient_councillor"]
     rating_df = dataframes["rating"]
-    
+    attribute_columns = [
+        councillor_df[attribute]
+        for attribute in COUNCILLOR_ATTRIBUTES
+        if attribute in councillor_df.columns
+    ]
+    if RATING_TIMESTAMP_COLUMN in rating_df.columns:
+        rated_at = F.to_timestamp(rating_df[RATING_TIMESTAMP_COLUMN]).cast("long")
+    else:
+        logger.warning(
+            f"Ratings have no {RATING_TIMESTAMP_COLUMN} column, decayed ratings are not updated"
+        )
+        rated_at = F.lit(None).cast("long")
+
     joined_df = (
         appointment_df.join(
             patient_councillor_df,
@@ -83,15 +230,155 @@ def joined_data(spark: SparkSession) -> DataFrame:
             councillor_df["id"].alias("councillor_id"),
             councillor_df["specialization"],
             rating_df["value"],
+            rating_df["id"].alias("rating_id"),
+            rated_at.alias("rated_at"),
+            *attribute_columns,
         )
     )
     return joined_df
 
 
-def data_transformations() -> dict:
+def decayed_rating_increments(
+    joined_df: DataFrame, decay_state: dict, as_of: float
+) -> tuple[dict, Optional[float], list]:
+    """
+    Sums the exponentially time-decayed ratings not yet folded into decay_state for each councillor.
+
+    Besides the ratings newer than the state's watermark, the ratings timestamped less than
+    WATERMARK_LOOKBACK_SECONDS before it are folded in unless their ID is among the state's
+    'recent_ratings', so that ratings sharing the watermark's second or arriving late are not lost.
+    Ratings arriving later than that, and ratings without a timestamp, still only count in
+    'average_value'.
+
+    Parameters:
+    - joined_df: DataFrame
+        The DataFrame given by joined_data function.
+    - decay_state: dict
+        The decay state the ratings are folded into. All ratings are used when it has no watermark.
+    - as_of: float
+        The unix time the ratings are decayed to.
+
+    Returns:
+    - tuple[dict, Optional[float], list]:
+        A dictionary of councillor_id to a ('decayed_sum', 'decayed_weight') tuple, the latest rating
+        timestamp seen (None if there was no new rating) and the IDs of the ratings to keep as the
+        state's 'recent_ratings'.
+    """
+    timestamped = joined_df.filter(F.col("rated_at").isNotNull())
+    watermark = decay_state.get("watermark")
+    recent_ratings = decay_state.get("recent_ratings")
+    new_ratings = timestamped
+    if watermark is not None and recent_ratings is None:
+        # State persisted before the recent ratings were kept: none of them can be told apart.
+        new_ratings = timestamped.filter(F.col("rated_at") > watermark)
+    elif watermark is not None:
+        new_ratings = timestamped.filter(
+            (F.col("rated_at") > watermark - WATERMARK_LOOKBACK_SECONDS)
+            & ~F.col("rating_id").isin(recent_ratings)
+        )
+
+    weight = F.exp(F.lit(-DECAY_RATE) * (F.lit(as_of) - F.col("rated_at")))
+    rows = (
+        new_ratings.groupBy("councillor_id")
+        .agg(
+            F.sum(F.col("value") * weight).alias("decayed_sum"),
+            F.sum(weight).alias("decayed_weight"),
+            F.max("rated_at").alias("latest_rating"),
+        )
+        .collect()
+    )
+
+    increments = {
+        row["councillor_id"]: (row["decayed_sum"], row["decayed_weight"])
+        for row in rows
+    }
+    latest_rating = max((row["latest_rating"] for row in rows), default=None)
+
+    new_watermark = max(
+        (timestamp for timestamp in (watermark, latest_rating) if timestamp is not None),
+        default=None,
+    )
+    if new_watermark is None:
+        return increments, latest_rating, []
+    recent_rows = (
+        timestamped.filter(
+            F.col("rated_at") > new_watermark - WATERMARK_LOOKBACK_SECONDS
+        )
+        .select("rating_id")
+        .distinct()
+        .collect()
+    )
+    return increments, latest_rating, sorted(row["rating_id"] for row in recent_rows)
+
+
+def councillor_ratings(spark: SparkSession, decay_state: dict) -> DataFrame:
+    """
+    Calculates the ratings of every councillor of every specialization in a single aggregation.
+
+    Parameters:
+    - spark: SparkSession
+        The SparkSession object used to access the DataFrames.
+    - decay_state: dict
+        The decay state persisted by the previous run. It is updated in place with this run's ratings.
+
+    Returns:
+    - DataFrame:
+        A DataFrame with one row per councillor containing the following columns:
+        - 'specialization': The specialization of the councillor.
+        - 'councillor_id': The ID of the councillor.
+        - The COUNCILLOR_ATTRIBUTES columns the councillor endpoint provides.
+        - 'average_value': The average rating of the councillor.
+        - 'rating_count': The number of ratings of the councillor.
+        - 'decayed_value': The time-decayed average rating of the councillor.
+    """
+    joined_df = joined_data(spark)
+
+    as_of = time.time()
+    increments, latest_rating, recent_ratings = decayed_rating_increments(
+        joined_df, decay_state, as_of
+    )
+    decay_state.update(
+        update_decay_state(
+            decay_state, increments, as_of, latest_rating, recent_ratings
+        )
+    )
+    decayed_df = spark.createDataFrame(
+        [
+            (councillor_id, decayed_score(decay_state, councillor_id))
+            for councillor_id in decay_state["councillors"]
+        ],
+        "decayed_councillor_id string, decayed_value double",
+    )
+
+    attributes = [
+        attribute for attribute in COUNCILLOR_ATTRIBUTES if attribute in joined_df.columns
+    ]
+    ratings_df = joined_df.groupBy("specialization", "councillor_id", *attributes).agg(
+        F.avg("value").alias("average_value"),
+        F.count("value").alias("rating_count"),
+    )
+    return ratings_df.join(
+        F.broadcast(decayed_df),
+        ratings_df["councillor_id"].cast("string")
+        == decayed_df["decayed_councillor_id"],
+        "left",
+    ).drop("decayed_councillor_id")
+
+
+def data_transformations(decay_state: Optional[dict] = None) -> dict:
     """
     Calculates the average rating for each councillor in each specialization based on the joined DataFrame.
 
+    Besides the plain 'average_value', every councillor gets a 'decayed_value': an exponentially
+    time-decayed average maintained incrementally in decay_state, so only the ratings received since the
+    previous run are aggregated. Every councillor record also carries its 'rating_count' and
+    COUNCILLOR_ATTRIBUTES values, which the matching service indexes to filter councillors.
+
+    Parameters:
+    - decay_state: Optional[dict]
+        The decay state persisted by the previous run. It is updated in place with this run's ratings.
+        A fresh state (i.e. a full historical computation) is used when None.
+
     Returns:
     - specialization_tables: dict
         A dictionary where each key represents a specialization, and the corresponding value is a DataFrame
@@ -108,6 +395,8 @@ def data_transformations() -> dict:
     Notes:
     - This function creates and stops a SparkSession internally to perform the necessary transformations.
       The SparkSession is not expected to be passed as a parameter.
+    - Every ranking is collected to the driver. See load_data_sharded in load.py to write the rankings
+      from the executors instead.
 
     Example Usage:
     ```
@@ -120,37 +409,22 @@ def data_transformations() -> dict:
 
     spark = SparkSession.builder.getOrCreate()
 
-    joined_df = joined_data(spark)
-    specializations = joined_df.select("specialization").distinct().collect()
-    print(specializations)
-
-    specialization_tables = {}
-
-    for specialization_row in specializations:
-        
-        specialization = specialization_row["specialization"]
-        # print(specialization)
-
-        filtered_df = joined_df.filter(joined_df["specialization"] == specialization)
-
-        average_df = (
-            (
-                filtered_df.groupBy("councillor_id")
-                .agg(F.avg("value").alias("average_value"))
-                .orderBy(F.desc("average_value"))
-                .drop("specialization")
-            )
-            .toJSON()
-            .collect()
-        )
+    if decay_state is None:
+        decay_state = empty_decay_state()
+    ratings_df = councillor_ratings(spark, decay_state)
 
-        specialization_tables[specialization] = average_df
+    # councillor_id settles ties, so that the rankings and their digests are the same on every run.
+    ranked_df = ratings_df.orderBy(F.desc("average_value"), "councillor_id")
+    specialization_tables: dict = {}
+    for record in map(json.loads, ranked_df.toJSON().collect()):
+        specialization = record.pop("specialization")
+        record.setdefault("decayed_value", None)
+        specialization_tables.setdefault(specialization, []).append(json.dumps(record))
 
     spark.stop()
     logger.info("Data has been transformed")
     return specialization_tables
 
 
-
 if __name__ == "__main__":
     data_transformations()
@@ -0,0 +1,20 @@
+import multiprocessing
+import os
+
+# Serves main:app with one uvicorn event loop per worker process:
+#     gunicorn -c gunicorn.conf.py main:app
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once in the master so that workers share its pages instead of each importing it.
+# Nothing holding a connection or a thread may be created at import time: workers open their own
+# connection pools, warm up and subscribe to ranking changes in the app lifespan.
+preload_app = True
+
+# A worker does not heartbeat while warming up in the app lifespan, see WARM_UP_TIMEOUT in main.py.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+
+# Let in-flight requests finish on SIGHUP (graceful reload) and SIGTERM.
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
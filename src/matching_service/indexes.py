@@ -0,0 +1,89 @@
+from bisect import bisect_left
+
+FILTER_ATTRIBUTES = ("language", "availability")
+
+
+def normalize_attribute(value: object) -> str:
+    """
+    Normalizes an attribute value so that stored values and query parameters compare equal.
+
+    Parameters:
+    - value (object): The attribute value, e.g. True, "true" or "English".
+
+    Returns:
+    - str: The lowercase string form of the value.
+    """
+    return str(value).lower()
+
+
+def build_ranking_index(ranking: list[dict]) -> dict:
+    """
+    Builds a bitmap index over the FILTER_ATTRIBUTES of a specialization ranking.
+
+    Parameters:
+    - ranking (list[dict]): The councillors of a specialization, best rated first.
+
+    Returns:
+    - dict: A dictionary of attribute to a dictionary of normalized value to bitmap, where bit i is set
+        when the councillor at position i of the ranking has that value. Its 'rating_count' entry holds
+        the distinct rating counts in ascending order and, for each of them, the bitmap of the
+        councillors having at least that many ratings.
+    """
+    index: dict = {attribute: {} for attribute in FILTER_ATTRIBUTES}
+    rating_counts: dict = {}
+    for position, councillor in enumerate(ranking):
+        for attribute in FILTER_ATTRIBUTES:
+            if councillor.get(attribute) is None:
+                continue
+            value = normalize_attribute(councillor[attribute])
+            index[attribute][value] = index[attribute].get(value, 0) | (1 << position)
+        rating_count = councillor.get("rating_count", 0)
+        rating_counts[rating_count] = rating_counts.get(rating_count, 0) | (1 << position)
+
+    thresholds = sorted(rating_counts)
+    at_least = []
+    bitmap = 0
+    for rating_count in reversed(thresholds):
+        bitmap |= rating_counts[rating_count]
+        at_least.append(bitmap)
+    index["rating_count"] = (thresholds, at_least[::-1])
+    return index
+
+
+def filter_ranking(
+    ranking: list[dict],
+    index: dict,
+    filters: dict,
+    min_rating_count: int = 0,
+    number_of_councillors: int = 15,
+) -> list[dict]:
+    """
+    Returns the best rated councillors of a ranking matching all the given filters.
+
+    The attribute and rating count filters are resolved by intersecting the bitmaps of the index, so only
+    the matching positions are visited, best rated first, until number_of_councillors councillors are found.
+
+    Parameters:
+    - ranking (list[dict]): The councillors of a specialization, best rated first.
+    - index (dict): The index given by build_ranking_index for the ranking.
+    - filters (dict): A dictionary of attribute (one of FILTER_ATTRIBUTES) to required value.
+    - min_rating_count (int, optional): The minimum number of ratings of a councillor. Defaults to 0.
+    - number_of_councillors (int, optional): The number of councillors to return. Defaults to 15.
+
+    Returns:
+    - list[dict]: The matching councillors, best rated first.
+    """
+    candidates = (1 << len(ranking)) - 1
+    for attribute, value in filters.items():
+        candidates &= index.get(attribute, {}).get(normalize_attribute(value), 0)
+    if min_rating_count > 0:
+        thresholds, at_least = index.get("rating_count", ([], []))
+        position = bisect_left(thresholds, min_rating_count)
+        candidates &= at_least[position] if position < len(thresholds) else 0
+
+    top_councillors: list[dict] = []
+    while candidates and len(top_councillors) < number_of_councillors:
+        lowest_bit = candidates & -candidates
+        candidates ^= lowest_bit
+        top_councillors.append(ranking[lowest_bit.bit_length() - 1])
+    return top_councillors
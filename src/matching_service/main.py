@@ -1,8 +1,66 @@
-import uvicorn
-from fastapi import FastAPI
-from matching import matching_councillors
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-app = FastAPI()
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse
+from matching import (
+    listen_for_ranking_changes,
+    matching_councillors,
+    paginate_councillors,
+    search_councillors,
+    warm_up_until_ready,
+)
+from resilience import CircuitOpenError
+
+ready = threading.Event()
+
+# Kept below the gunicorn worker timeout, as the worker does not heartbeat while starting up.
+WARM_UP_TIMEOUT = float(os.getenv("WARM_UP_TIMEOUT", "20"))
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """
+    Runs in every worker process. Warms the worker up before it accepts any connection, for at most
+    WARM_UP_TIMEOUT seconds: past that the worker starts serving and keeps warming up in the background,
+    answering 503 on /ready until done. It also listens for the rankings changed by the ETL so that the
+    worker drops only those from its caches, without being restarted.
+    """
+    stop = threading.Event()
+    if not await asyncio.to_thread(warm_up_until_ready, ready, stop, WARM_UP_TIMEOUT):
+        threading.Thread(
+            target=warm_up_until_ready, args=(ready, stop), daemon=True
+        ).start()
+    threading.Thread(
+        target=listen_for_ranking_changes, args=(stop,), daemon=True
+    ).start()
+    yield
+    stop.set()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/ready")
+def get_readiness() -> JSONResponse:
+    """
+    Readiness probe: 200 once the worker is warmed up, 503 until then.
+    """
+    if ready.is_set():
+        return JSONResponse(status_code=200, content={"ready": True})
+    return JSONResponse(status_code=503, content={"ready": False})
+
+
+@app.exception_handler(CircuitOpenError)
+def circuit_open_handler(request: Request, error: CircuitOpenError) -> JSONResponse:
+    """
+    Answers with 503 Service Unavailable when an upstream is skipped because its circuit is open
+    and no last known good value can be served instead.
+    """
+    return JSONResponse(status_code=503, content={"detail": str(error)})
 
 
 @app.get("/councillors/{report_id}/")
@@ -22,6 +80,60 @@ def get_councillors(report_id: int) -> list[dict]:
     return result
 
 
+@app.get("/councillors/{report_id}/search")
+def get_filtered_councillors(
+    report_id: int,
+    number_of_councillors: int = 15,
+    language: Optional[str] = None,
+    availability: Optional[str] = None,
+    min_rating_count: int = 0,
+) -> list[dict]:
+    """
+    Retrieve councillors matching the given report_id and filters.
+
+    Parameters:
+    - report_id (int): The ID of the report to retrieve councillors for.
+    - number_of_councillors (int, optional): The number of councillors to match. Defaults to 15.
+    - language (str, optional): The language the councillors must speak.
+    - availability (str, optional): The availability the councillors must have.
+    - min_rating_count (int, optional): The minimum number of ratings of a councillor. Defaults to 0.
+
+    Returns:
+    - list[dict]: A list of dictionary containing the retrieved councillors with their avr_rating.
+    """
+    filters = {
+        attribute: value
+        for attribute, value in (("language", language), ("availability", availability))
+        if value is not None
+    }
+    result = search_councillors(
+        report_id, filters, min_rating_count, number_of_councillors
+    )
+    return result
+
+
+@app.get("/councillors/{report_id}/page")
+def get_councillors_page(
+    report_id: int,
+    cursor: int = Query(0, ge=0),
+    page_size: int = Query(15, ge=1),
+) -> dict:
+    """
+    Retrieve a page of the councillors matching the given report_id.
+
+    Parameters:
+    - report_id (int): The ID of the report to retrieve councillors for.
+    - cursor (int, optional): The next_cursor returned with the previous page. Defaults to 0 (first page).
+    - page_size (int, optional): The number of councillors in the page. Defaults to 15.
+
+    Returns:
+    - dict: The 'councillors' of the page with their avr_rating, and the 'next_cursor' of the following
+        page, which is None on the last page.
+    """
+    result = paginate_councillors(report_id, cursor, page_size)
+    return result
+
+
 @app.get("/councillors/{report_id}/{number_of_councillors}")
 def get_specific_councillors(report_id: int, number_of_councillors: int) -> list[dict]:
     """
@@ -39,4 +151,11 @@ def get_specific_councillors(report_id: int, number_of_councillors: int) -> list
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
@@ -1,14 +1,89 @@
 import json # type: ignore
 import os # type: ignore
+import threading
+import time
+from typing import Optional
 
 import requests  # type: ignore
 from dotenv import load_dotenv
 
 from base_logger import logger
+from indexes import build_ranking_index, filter_ranking
+from ranking_snapshot import RankingSnapshot, current_snapshot
 from redis_connector import get_redis_client
+from resilience import CircuitBreaker, StaleWhileRevalidateCache
 
 load_dotenv()
 
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", "2"))
+REPORT_POOL_SIZE = int(os.getenv("REPORT_POOL_SIZE", "20"))
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "300"))
+RANKING_CACHE_TTL = float(os.getenv("RANKING_CACHE_TTL", "60"))
+STALE_WHILE_REVALIDATE = os.getenv("STALE_WHILE_REVALIDATE", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+RECONNECT_INTERVAL = float(os.getenv("RECONNECT_INTERVAL", "5"))
+RANKING_LIST_PREFIX = "ranking:"
+RANKING_CHANGES_CHANNEL = "rankings:changes"
+RANKING_SNAPSHOT_PATH = os.getenv("RANKING_SNAPSHOT_PATH")
+
+
+def is_report_failure(error: Exception) -> bool:
+    """
+    Tells whether an error of get_report_category means that the report service is failing.
+
+    Parameters:
+    - error (Exception): The error raised by get_report_category.
+
+    Returns:
+    - bool: False for the 4xx responses (e.g. 404 for an unknown report), True for the 5xx responses,
+        timeouts, connection errors and any other error.
+    """
+    response = getattr(error, "response", None)
+    if isinstance(error, requests.HTTPError) and response is not None:
+        return response.status_code >= 500
+    return True
+
+
+report_breaker = CircuitBreaker(
+    "report", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, is_report_failure
+)
+redis_breaker = CircuitBreaker("redis", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+report_category_cache = StaleWhileRevalidateCache(
+    REPORT_CACHE_TTL, STALE_WHILE_REVALIDATE, CACHE_MAX_ENTRIES
+)
+ranking_page_cache = StaleWhileRevalidateCache(
+    RANKING_CACHE_TTL, STALE_WHILE_REVALIDATE, CACHE_MAX_ENTRIES
+)
+ranking_cache = StaleWhileRevalidateCache(
+    RANKING_CACHE_TTL, STALE_WHILE_REVALIDATE, CACHE_MAX_ENTRIES
+)
+
+_report_sessions: dict = {}
+
+
+def get_report_session() -> requests.Session:
+    """
+    Retrieve the HTTP session of the process, which keeps its connections to the report service open
+    between requests.
+
+    Returns:
+    - requests.Session: The session, created on the first call.
+    """
+    session = _report_sessions.get("session")
+    if session is None:
+        session = requests.Session()
+        session.mount(
+            "http://", requests.adapters.HTTPAdapter(pool_maxsize=REPORT_POOL_SIZE)
+        )
+        session.mount(
+            "https://", requests.adapters.HTTPAdapter(pool_maxsize=REPORT_POOL_SIZE)
+        )
+        session = _report_sessions.setdefault("session", session)
+    return session
+
 
 def get_report_category(report_id: int) -> str:
     """
@@ -25,7 +100,7 @@ def get_report_category(report_id: int) -> str:
     # url = f"http://report.us-west-2.elasticbeanstalk.com/report/{report_id}"
     url = f"{os.getenv('BASE_URL')}/report/{report_id}"
     # print(url)
-    response = requests.get(url)
+    response = get_report_session().get(url, timeout=REPORT_TIMEOUT)
     try:
         response.raise_for_status()
     except requests.HTTPError:
@@ -38,6 +113,24 @@ def get_report_category(report_id: int) -> str:
     return response_data["category"]
 
 
+def cached_report_category(report_id: int) -> str:
+    """
+    Retrieve the category of a report from the in-process cache, falling back to get_report_category.
+
+    The last known category is served while the report service is slow or failing, and the report
+    service is not called at all while its circuit breaker is open.
+
+    Parameters:
+    - report_id (int): The ID of the report to retrieve the category for.
+
+    Returns:
+    - str: The category of the report.
+    """
+    return report_category_cache.get(
+        report_id, lambda: report_breaker.call(get_report_category, report_id)
+    )
+
+
 def matching_councillors(report_id: int, number_of_councillors: int = 15) -> list[dict]:
     """
     Retrieve the top councillors matching the given report_id and number_of_councillors.
@@ -50,10 +143,219 @@ def matching_councillors(report_id: int, number_of_councillors: int = 15) -> lis
     Returns:
     - list: A list of dictionaries representing the top councillors.
     """
-    report_category = get_report_category(report_id)
-    councillors_with_ratings = json.loads(get_redis_client().get(report_category))
-    top_councillors = [
-        json.loads(item) for item in councillors_with_ratings[:number_of_councillors]
-    ]
+    report_category = cached_report_category(report_id)
+    top_councillors = get_ranking_page(report_category, 0, number_of_councillors)
     logger.info("Returning top councillors")
     return top_councillors
+
+
+def get_ranking_page(category: str, offset: int, size: int) -> list[dict]:
+    """
+    Retrieve a page of the ranking of a category with a range read, without loading the whole ranking.
+    Pages are decoded from the memory-mapped ranking snapshot when RANKING_SNAPSHOT_PATH is set and the
+    ETL has written it, and otherwise served from Redis through the in-process cache like
+    cached_report_category.
+
+    Parameters:
+    - category (str): The category (specialization) to retrieve the ranking page for.
+    - offset (int): The position of the first councillor of the page.
+    - size (int): The maximum number of councillors in the page.
+
+    Returns:
+    - list[dict]: The councillors of the page, best rated first.
+    """
+    if size <= 0:
+        return []
+    snapshot = _ranking_snapshot()
+    if snapshot is not None:
+        return snapshot.page(category, offset, size)
+    return ranking_page_cache.get(
+        (category, offset, size),
+        lambda: redis_breaker.call(_read_ranking_page, category, offset, size),
+    )
+
+
+def _ranking_snapshot() -> Optional[RankingSnapshot]:
+    if not RANKING_SNAPSHOT_PATH:
+        return None
+    return current_snapshot(RANKING_SNAPSHOT_PATH)
+
+
+def _read_ranking_page(category: str, offset: int, size: int) -> list[dict]:
+    items = get_redis_client().lrange(
+        f"{RANKING_LIST_PREFIX}{category}", offset, offset + size - 1
+    )
+    return [json.loads(item) for item in items]
+
+
+def paginate_councillors(report_id: int, cursor: int = 0, page_size: int = 15) -> dict:
+    """
+    Retrieve a page of the councillors matching the given report_id.
+
+    Parameters:
+    - report_id (int): The ID of the report to retrieve councillors for.
+    - cursor (int, optional): The cursor returned with the previous page. Defaults to 0 (first page).
+    - page_size (int, optional): The number of councillors in the page. Defaults to 15.
+
+    Returns:
+    - dict: A dictionary with the 'councillors' of the page and the 'next_cursor' to request the
+        following page, which is None on the last page.
+    """
+    report_category = cached_report_category(report_id)
+    councillors = get_ranking_page(report_category, cursor, page_size + 1)
+    next_cursor = cursor + page_size if len(councillors) > page_size else None
+    logger.info("Returning councillors page")
+    return {"councillors": councillors[:page_size], "next_cursor": next_cursor}
+
+
+def get_ranking(category: str) -> tuple[list[dict], dict]:
+    """
+    Retrieve the ranking of a category together with its filter index.
+
+    The parsed ranking and its index are kept in the in-process cache like cached_report_category,
+    so that filtered queries do not fetch and parse the whole specialization on every request.
+
+    Parameters:
+    - category (str): The category (specialization) to retrieve the ranking for.
+
+    Returns:
+    - tuple[list[dict], dict]: The councillors of the category, best rated first, and the index given
+        by build_ranking_index for them.
+    """
+    return ranking_cache.get(
+        category, lambda: redis_breaker.call(_read_ranking, category)
+    )
+
+
+def _read_ranking(category: str) -> tuple[list[dict], dict]:
+    stored_ranking = get_redis_client().get(category)
+    ranking = (
+        [json.loads(item) for item in json.loads(stored_ranking)]
+        if stored_ranking is not None
+        else []
+    )
+    return ranking, build_ranking_index(ranking)
+
+
+def search_councillors(
+    report_id: int,
+    filters: dict,
+    min_rating_count: int = 0,
+    number_of_councillors: int = 15,
+) -> list[dict]:
+    """
+    Retrieve the top councillors matching the given report_id and filters.
+
+    Parameters:
+    - report_id (int): The ID of the report to retrieve councillors for.
+    - filters (dict): A dictionary of councillor attribute (e.g. 'language') to required value.
+    - min_rating_count (int, optional): The minimum number of ratings of a councillor. Defaults to 0.
+    - number_of_councillors (int, optional): The number of councillors to match.
+        Defaults to 15 if not provided.
+
+    Returns:
+    - list: A list of dictionaries representing the top matching councillors.
+    """
+    report_category = cached_report_category(report_id)
+    ranking, index = get_ranking(report_category)
+    top_councillors = filter_ranking(
+        ranking, index, filters, min_rating_count, number_of_councillors
+    )
+    logger.info("Returning filtered top councillors")
+    return top_councillors
+
+
+def invalidate_ranking(category: str) -> None:
+    """
+    Drops the cached ranking and ranking pages of a category.
+
+    Parameters:
+    - category (str): The category (specialization) whose ranking changed.
+    """
+    ranking_cache.invalidate(category)
+    # The page cache is keyed by (category, offset, size).
+    ranking_page_cache.invalidate_if(
+        lambda key: isinstance(key, tuple) and key[0] == category
+    )
+
+
+def listen_for_ranking_changes(stop: threading.Event) -> None:
+    """
+    Calls invalidate_ranking for every specialization the ETL publishes on RANKING_CHANGES_CHANNEL, until
+    stop is set. The subscription is renewed when the connection to Redis is lost, and every cached
+    ranking is dropped on (re)subscription as the changes published meanwhile are lost.
+
+    Parameters:
+    - stop (threading.Event): The event ending the subscription.
+    """
+    while not stop.is_set():
+        pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(RANKING_CHANGES_CHANNEL)
+            ranking_page_cache.invalidate()
+            ranking_cache.invalidate()
+            while not stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    category = message["data"]
+                    if isinstance(category, bytes):
+                        category = category.decode("utf-8")
+                    invalidate_ranking(category)
+                    logger.info(f"Ranking of {category} changed, cache cleared")
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning(f"Lost the ranking changes subscription: {error!r}")
+            stop.wait(RECONNECT_INTERVAL)
+        finally:
+            pubsub.close()
+
+
+def warm_up(number_of_councillors: int = 15) -> None:
+    """
+    Opens the connections to Redis and the report service and loads the first page of every ranking, so
+    that the first requests served by the process do not pay for them.
+
+    Parameters:
+    - number_of_councillors (int, optional): The size of the ranking pages to load. Defaults to 15.
+    """
+    redis_client = get_redis_client()
+    redis_client.ping()
+
+    for key in redis_client.scan_iter(match=f"{RANKING_LIST_PREFIX}*"):
+        key = key.decode("utf-8") if isinstance(key, bytes) else key
+        get_ranking_page(key[len(RANKING_LIST_PREFIX) :], 0, number_of_councillors)
+
+    try:
+        get_report_session().head(f"{os.getenv('BASE_URL')}", timeout=REPORT_TIMEOUT)
+    except requests.RequestException as error:
+        logger.warning(f"Could not open a connection to the report service: {error!r}")
+    logger.info("Warmed up")
+
+
+def warm_up_until_ready(
+    ready: threading.Event, stop: threading.Event, timeout: Optional[float] = None
+) -> bool:
+    """
+    Calls warm_up until it succeeds, then sets ready.
+
+    Parameters:
+    - ready (threading.Event): The event set once warm.
+    - stop (threading.Event): The event ending the retries.
+    - timeout (float, optional): The number of seconds after which the retries are given up. Retries
+        until stop is set when None.
+
+    Returns:
+    - bool: Whether the process is warm.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not stop.is_set():
+        try:
+            warm_up()
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning(f"Warm up failed: {error!r}")
+            if deadline is not None and time.monotonic() + RECONNECT_INTERVAL > deadline:
+                return False
+            stop.wait(RECONNECT_INTERVAL)
+        else:
+            ready.set()
+            return True
+    return False
@@ -0,0 +1,136 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+# Layout written by the ETL service (src/etl_service/snapshot.py).
+SNAPSHOT_MAGIC = b"CRSNAP02"
+HEADER_FORMAT = "<8sIQI"
+INDEX_FORMAT = "<64sQI"
+RECORD_FORMAT = "<qddIII"
+STRING_FORMAT = "<I"
+SNAPSHOT_ATTRIBUTES = ("language", "availability")
+NO_VALUE = 0xFFFFFFFF
+
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "1"))
+
+
+class RankingSnapshot:
+    """
+    Read-only memory-mapped view of a ranking snapshot file.
+
+    The file is mapped once and records are decoded straight from the mapping, so every worker process
+    mapping the same snapshot shares a single physical copy of it through the page cache. Only the small
+    string table of the attribute values is decoded up front.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as snapshot_file:
+            self.stat = os.fstat(snapshot_file.fileno())
+            self._mapping = mmap.mmap(
+                snapshot_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+        if self._mapping[: len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a ranking snapshot")
+        _, count, strings_offset, strings_count = struct.unpack_from(
+            HEADER_FORMAT, self._mapping, 0
+        )
+
+        self._index: dict = {}
+        index_offset = struct.calcsize(HEADER_FORMAT)
+        for _ in range(count):
+            name, offset, records = struct.unpack_from(
+                INDEX_FORMAT, self._mapping, index_offset
+            )
+            self._index[name.rstrip(b"\0").decode("utf-8")] = (offset, records)
+            index_offset += struct.calcsize(INDEX_FORMAT)
+
+        self._strings: list = []
+        for _ in range(strings_count):
+            (length,) = struct.unpack_from(STRING_FORMAT, self._mapping, strings_offset)
+            strings_offset += struct.calcsize(STRING_FORMAT)
+            value = self._mapping[strings_offset : strings_offset + length]
+            self._strings.append(json.loads(value.decode("utf-8")))
+            strings_offset += length
+
+    def page(self, specialization: str, offset: int, size: int) -> list[dict]:
+        """
+        Decodes a page of the ranking of a specialization.
+
+        Parameters:
+        - specialization (str): The specialization to read the ranking of.
+        - offset (int): The position of the first councillor of the page.
+        - size (int): The maximum number of councillors in the page.
+
+        Returns:
+        - list[dict]: The councillors of the page, best rated first. Empty for an unknown specialization.
+        """
+        first_record, records = self._index.get(specialization, (0, 0))
+        record_size = struct.calcsize(RECORD_FORMAT)
+        return [
+            self._decode_record(first_record + position * record_size)
+            for position in range(max(offset, 0), min(offset + size, records))
+        ]
+
+    def _decode_record(self, position: int) -> dict:
+        (
+            councillor_id,
+            average_value,
+            decayed_value,
+            rating_count,
+            *codes,
+        ) = struct.unpack_from(RECORD_FORMAT, self._mapping, position)
+        record = {
+            "councillor_id": councillor_id,
+            "average_value": average_value,
+            "rating_count": rating_count,
+            "decayed_value": None if math.isnan(decayed_value) else decayed_value,
+        }
+        # Missing attributes are left out, like in the rankings stored in Redis.
+        for attribute, code in zip(SNAPSHOT_ATTRIBUTES, codes):
+            if code != NO_VALUE:
+                record[attribute] = self._strings[code]
+        return record
+
+
+_current: dict = {"snapshot": None, "checked_at": -math.inf}
+_reload_lock = threading.Lock()
+
+
+def current_snapshot(path: str) -> Optional[RankingSnapshot]:
+    """
+    Returns the snapshot mapped from path, remapping it when the ETL has replaced the file.
+
+    The file is checked at most every SNAPSHOT_CHECK_INTERVAL seconds. A replaced snapshot stays mapped
+    until the pages being read from it are done, as the ETL renames a new file over path instead of
+    rewriting it.
+
+    Parameters:
+    - path (str): The path of the snapshot file.
+
+    Returns:
+    - Optional[RankingSnapshot]: The current snapshot, or None if there is no snapshot file yet.
+    """
+    if time.monotonic() - _current["checked_at"] < SNAPSHOT_CHECK_INTERVAL:
+        return _current["snapshot"]
+
+    with _reload_lock:
+        _current["checked_at"] = time.monotonic()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            _current["snapshot"] = None
+            return None
+
+        snapshot = _current["snapshot"]
+        if snapshot is None or (stat.st_ino, stat.st_mtime_ns) != (
+            snapshot.stat.st_ino,
+            snapshot.stat.st_mtime_ns,
+        ):
+            _current["snapshot"] = RankingSnapshot(path)
+        return _current["snapshot"]
@@ -1,8 +1,27 @@
+import os
+
 import redis  # type: ignore
 
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+
+# Connection pool of the process, created on first use so that it is never shared across a fork.
+_connection_pools: dict = {}
+
 
 def get_redis_client() -> redis.client.Redis:
-    redis_client = redis.Redis(host="localhost", port=6379, db=0)
+    connection_pool = _connection_pools.get("pool")
+    if connection_pool is None:
+        connection_pool = _connection_pools.setdefault(
+            "pool",
+            redis.ConnectionPool(
+                host="localhost",
+                port=6379,
+                db=0,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            ),
+        )
+    redis_client = redis.Redis(connection_pool=connection_pool)
     return redis_client
 
 
@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional
+
+from base_logger import logger
+
+_revalidation_executor = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="revalidate"
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream for reset_timeout seconds once failure_threshold consecutive
+    calls have failed. After that period a single trial call is let through: its success closes the
+    circuit again, its failure keeps it open for another reset_timeout seconds.
+
+    Only the exceptions for which is_failure returns True count as failures. The others, e.g. a client
+    error answered by a healthy upstream, are raised as they are and count as successful calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        is_failure: Callable[[Exception], bool] = lambda error: True,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def call(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Calls function with args unless the circuit is open.
+
+        Parameters:
+        - function (Callable): The function calling the upstream.
+        - args: The arguments of the function.
+
+        Returns:
+        - Any: The result of the function.
+
+        Raises:
+        - CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is not None:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit {self.name} is open")
+                # Let this call through as a trial and keep the others out meanwhile.
+                self._opened_at = time.monotonic()
+
+        try:
+            result = function(*args)
+        except Exception as error:
+            if self.is_failure(error):
+                self._record_failure()
+            else:
+                self._record_success()
+            raise
+        self._record_success()
+        return result
+
+    def reset(self) -> None:
+        """Closes the circuit and forgets the past failures."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Circuit {self.name} opened")
+                self._opened_at = time.monotonic()
+
+    def _record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Circuit {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+
+
+class StaleWhileRevalidateCache:
+    """
+    In-process cache keeping the last known good value of every key.
+
+    Values younger than ttl seconds are served as they are. Older values are served immediately while
+    a background refresh is scheduled when stale_while_revalidate is enabled; otherwise they are
+    reloaded synchronously and only served when the reload fails.
+
+    At most maxsize values are kept; the least recently used one is dropped to make room for a new one.
+    """
+
+    def __init__(
+        self, ttl: float, stale_while_revalidate: bool = True, maxsize: int = 1024
+    ):
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._refreshing: set = set()
+        # Number of loads in flight and generation of every key being loaded. The generation is bumped
+        # by the invalidations, so that a load started before one does not store its outdated value.
+        self._loading: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the value of key, calling loader to (re)load it when needed.
+
+        Parameters:
+        - key (Hashable): The cache key.
+        - loader (Callable): A function without arguments returning the fresh value of key.
+
+        Returns:
+        - Any: The fresh or last known good value of key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return self._load(key, loader)
+
+        loaded_at, value = entry
+        if time.monotonic() - loaded_at < self.ttl:
+            return value
+
+        if self.stale_while_revalidate:
+            self._schedule_refresh(key, loader)
+            return value
+
+        try:
+            return self._load(key, loader)
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning(f"Serving stale value of {key!r}: {error!r}")
+            return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Drops the value of key, or every value when key is None. The loads of the dropped keys that are
+        in flight do not store their value.
+
+        Parameters:
+        - key (Hashable, optional): The cache key to drop.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                for loading in self._loading.values():
+                    loading[1] += 1
+            else:
+                self._entries.pop(key, None)
+                if key in self._loading:
+                    self._loading[key][1] += 1
+
+    def invalidate_if(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Drops the values of the keys matching predicate, like invalidate.
+
+        Parameters:
+        - predicate (Callable): A function returning True for the keys to drop.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+            for key, loading in self._loading.items():
+                if predicate(key):
+                    loading[1] += 1
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            loading = self._loading.setdefault(key, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+        try:
+            value = loader()
+            with self._lock:
+                if loading[1] == generation:
+                    self._entries[key] = (time.monotonic(), value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if loading[0] == 0:
+                    del self._loading[key]
+
+    def _schedule_refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        _revalidation_executor.submit(self._refresh, key, loader)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            self._load(key, loader)
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning(f"Background refresh of {key!r} failed: {error!r}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
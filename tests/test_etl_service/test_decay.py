@@ -0,0 +1,59 @@
+import unittest
+
+from src.etl_service.decay import (
+    HALF_LIFE_DAYS,
+    decayed_score,
+    empty_decay_state,
+    update_decay_state,
+)
+
+HALF_LIFE = HALF_LIFE_DAYS * 24 * 60 * 60
+
+
+class TestDecayState(unittest.TestCase):
+    def test_first_update_uses_increments(self):
+        state = update_decay_state(empty_decay_state(), {7: (8.0, 2.0)}, 100.0, 90.0)
+
+        self.assertEqual(state["as_of"], 100.0)
+        self.assertEqual(state["watermark"], 90.0)
+        self.assertEqual(
+            state["councillors"], {"7": {"decayed_sum": 8.0, "decayed_weight": 2.0}}
+        )
+        self.assertEqual(decayed_score(state, 7), 4.0)
+
+    def test_update_halves_previous_sums_after_half_life(self):
+        state = update_decay_state(empty_decay_state(), {7: (4.0, 1.0)}, 0.0, 0.0)
+
+        state = update_decay_state(state, {7: (1.0, 1.0)}, HALF_LIFE, HALF_LIFE)
+
+        entry = state["councillors"]["7"]
+        self.assertAlmostEqual(entry["decayed_sum"], 3.0)
+        self.assertAlmostEqual(entry["decayed_weight"], 1.5)
+        self.assertAlmostEqual(decayed_score(state, 7), 2.0)
+
+    def test_update_without_new_ratings_keeps_watermark_and_score(self):
+        state = update_decay_state(empty_decay_state(), {7: (4.0, 1.0)}, 0.0, 0.0)
+
+        state = update_decay_state(state, {}, HALF_LIFE, None)
+
+        self.assertEqual(state["watermark"], 0.0)
+        self.assertAlmostEqual(decayed_score(state, 7), 4.0)
+
+    def test_update_keeps_later_watermark_and_recent_ratings(self):
+        state = update_decay_state(
+            empty_decay_state(), {7: (4.0, 1.0)}, 100.0, 100.0, [1, 2]
+        )
+
+        late = update_decay_state(state, {7: (1.0, 1.0)}, 100.0, 90.0, [1, 2, 3])
+        unchanged = update_decay_state(late, {}, 100.0, None)
+
+        self.assertEqual(late["watermark"], 100.0)
+        self.assertEqual(late["recent_ratings"], [1, 2, 3])
+        self.assertEqual(unchanged["recent_ratings"], [1, 2, 3])
+
+    def test_decayed_score_unknown_councillor(self):
+        self.assertIsNone(decayed_score(empty_decay_state(), 7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,13 @@
 import json
 import os
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 
 import requests
 
-from src.etl_service.extract import get_api_data
+from src.etl_service import extract
+from src.etl_service.extract import get_api_data, get_api_data_with_fallback
 
 urls = {
     "appointment": f"{os.getenv('BASE_URL')}/appointment",
@@ -32,7 +34,9 @@ class TestGetApiData(unittest.TestCase):
         result = get_api_data(urls)
 
         # Assertions
-        requests.get.assert_called_once_with(urls)
+        requests.get.assert_called_once_with(
+            urls, timeout=extract.EXTRACT_TIMEOUT
+        )
         mock_response.raise_for_status.assert_called_once()
         self.assertEqual(result, {"key": "value"})
 
@@ -46,7 +50,9 @@ class TestGetApiData(unittest.TestCase):
             get_api_data(urls)
 
         # Assertions
-        requests.get.assert_called_once_with(urls)
+        requests.get.assert_called_once_with(
+            urls, timeout=extract.EXTRACT_TIMEOUT
+        )
         self.assertIn(
             "404 Client Error",
             str(context.exception),
@@ -64,9 +70,60 @@ class TestGetApiData(unittest.TestCase):
 
         response_data = get_api_data(urls)
 
-        mock_request_get.assert_called_once_with(urls)
+        mock_request_get.assert_called_once_with(
+            urls, timeout=extract.EXTRACT_TIMEOUT
+        )
         self.assertEqual(response_data, return_json)
 
 
+@patch("src.etl_service.extract.time.sleep", Mock())
+class TestGetApiDataWithFallback(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(extract, "EXTRACT_CACHE_DIR", self.cache_dir.name)
+        self.patcher.start()
+        extract.extract_status.clear()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.cache_dir.cleanup()
+
+    @patch("src.etl_service.extract.get_api_data")
+    def test_retries_until_success(self, mock_get_api_data):
+        mock_get_api_data.side_effect = [requests.ConnectionError("down"), {"key": "value"}]
+
+        result = get_api_data_with_fallback("rating", "url")
+
+        self.assertEqual(result, {"key": "value"})
+        self.assertEqual(mock_get_api_data.call_count, 2)
+        self.assertFalse(extract.extract_status["rating"]["stale"])
+
+    @patch("src.etl_service.extract.get_api_data")
+    def test_falls_back_to_last_payload(self, mock_get_api_data):
+        mock_get_api_data.return_value = {"key": "value"}
+        get_api_data_with_fallback("rating", "url")
+        fetched_at = extract.extract_status["rating"]["fetched_at"]
+        mock_get_api_data.reset_mock()
+        mock_get_api_data.side_effect = requests.HTTPError("500 Server Error")
+
+        with patch.dict(extract.retry_budgets, {"rating": 1}):
+            result = get_api_data_with_fallback("rating", "url")
+
+        self.assertEqual(result, {"key": "value"})
+        self.assertEqual(mock_get_api_data.call_count, 2)
+        self.assertEqual(
+            extract.extract_status["rating"], {"stale": True, "fetched_at": fetched_at}
+        )
+
+    @patch("src.etl_service.extract.get_api_data")
+    def test_raises_without_last_payload(self, mock_get_api_data):
+        mock_get_api_data.side_effect = requests.HTTPError("500 Server Error")
+
+        with self.assertRaises(requests.HTTPError):
+            get_api_data_with_fallback("rating", "url")
+
+        self.assertNotIn("rating", extract.extract_status)
+
+
 if __name__ == "__main__":
     unittest.main()
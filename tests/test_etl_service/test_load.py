@@ -1,11 +1,20 @@
+import hashlib
 import json
 import unittest
 from unittest.mock import MagicMock, Mock, patch
 
 import redis
+from pyspark.sql import Row
 from redis import Redis
 
-from src.etl_service.load import load_data_to_redis
+from src.etl_service.decay import decayed_score, empty_decay_state, update_decay_state
+from src.etl_service.load import (
+    load_data_sharded,
+    load_data_to_redis,
+    store_partition,
+    store_ranking_list,
+    store_rankings,
+)
 
 
 class TestLoadDataToRedis(unittest.TestCase):
@@ -66,6 +75,118 @@ class TestLoadDataToRedis(unittest.TestCase):
                 str(redis_client.get(key), "utf-8"), json.dumps(val, indent=2)
             )
 
+    def test_store_rankings_writes_changed_rankings_only(self):
+        redis_client = MagicMock(spec=Redis)
+        unchanged = ['{"id": 1}']
+        digest = hashlib.sha256(json.dumps(unchanged).encode("utf-8")).hexdigest()
+        redis_client.hget.side_effect = lambda key, field: (
+            digest.encode("utf-8") if field == "unchanged" else None
+        )
+
+        changed = store_rankings(
+            redis_client, {"unchanged": unchanged, "changed": ['{"id": 2}']}
+        )
+
+        self.assertEqual(changed, ["changed"])
+        redis_client.set.assert_called_once_with(
+            "changed", json.dumps(['{"id": 2}'], indent=2)
+        )
+        redis_client.hset.assert_called_once()
+        redis_client.publish.assert_called_once_with("rankings:changes", "changed")
+
+    def test_store_rankings_skips_rankings_without_new_ratings(self):
+        state = update_decay_state(
+            empty_decay_state(),
+            {
+                councillor_id: (councillor_id * 0.37, 0.1 + councillor_id * 0.01)
+                for councillor_id in range(200)
+            },
+            1_700_000_000.0,
+            1_700_000_000.0,
+        )
+        digests = {}
+        redis_client = MagicMock(spec=Redis)
+        redis_client.hget.side_effect = lambda key, field: digests.get(field)
+        redis_client.hset.side_effect = lambda key, field, digest: digests.update(
+            {field: digest.encode("utf-8")}
+        )
+
+        def rankings(decay_state):
+            return {
+                "Anxiety": [
+                    json.dumps(
+                        {
+                            "councillor_id": councillor_id,
+                            "decayed_value": decayed_score(decay_state, councillor_id),
+                        }
+                    )
+                    for councillor_id in range(200)
+                ]
+            }
+
+        self.assertEqual(store_rankings(redis_client, rankings(state)), ["Anxiety"])
+        # A run three minutes later without any new rating.
+        state = update_decay_state(state, {}, 1_700_000_180.0, None)
+
+        self.assertEqual(store_rankings(redis_client, rankings(state)), [])
+
+    @patch("src.etl_service.load.councillor_ratings")
+    @patch("src.etl_service.load.SparkSession")
+    def test_load_data_sharded(self, mock_spark_session, mock_councillor_ratings):
+        spark = mock_spark_session.builder.getOrCreate.return_value
+        ratings_df = mock_councillor_ratings.return_value
+        decay_state = {"watermark": None}
+
+        load_data_sharded(decay_state, 4)
+
+        mock_councillor_ratings.assert_called_once_with(spark, decay_state)
+        ratings_df.repartition.assert_called_once_with(4, "specialization")
+        sorted_df = ratings_df.repartition.return_value.sortWithinPartitions
+        self.assertEqual(sorted_df.call_args.args[0], "specialization")
+        self.assertEqual(sorted_df.call_args.args[2], "councillor_id")
+        sorted_df.return_value.foreachPartition.assert_called_once_with(store_partition)
+        spark.stop.assert_called_once()
+
+    def test_store_ranking_list(self):
+        redis_client = MagicMock(spec=Redis)
+        pipeline = redis_client.pipeline.return_value
+
+        store_ranking_list(redis_client, "specialization1", ['{"id": 1}', '{"id": 2}'])
+
+        pipeline.delete.assert_called_once_with("ranking:specialization1")
+        pipeline.rpush.assert_called_once_with(
+            "ranking:specialization1", '{"id": 1}', '{"id": 2}'
+        )
+        pipeline.execute.assert_called_once()
+
+    @patch("src.etl_service.load.store_rankings")
+    @patch("src.etl_service.load.get_redis_client")
+    def test_store_partition(self, mock_get_redis_client, mock_store_rankings):
+        rows = [
+            Row(specialization="Anxiety", councillor_id=2909, average_value=5.0),
+            Row(specialization="Anxiety", councillor_id=8887, average_value=4.0),
+            Row(specialization="Depression", councillor_id=1, average_value=3.0),
+        ]
+
+        store_partition(iter(rows))
+
+        mock_store_rankings.assert_called_once_with(
+            mock_get_redis_client.return_value,
+            {
+                "Anxiety": [
+                    json.dumps({"councillor_id": 2909, "average_value": 5.0}),
+                    json.dumps({"councillor_id": 8887, "average_value": 4.0}),
+                ],
+                "Depression": [json.dumps({"councillor_id": 1, "average_value": 3.0})],
+            },
+        )
+
+    @patch("src.etl_service.load.get_redis_client")
+    def test_store_partition_empty(self, mock_get_redis_client):
+        store_partition(iter([]))
+
+        mock_get_redis_client.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,104 @@
+import json
+import math
+import os
+import struct
+import tempfile
+import unittest
+
+from src.etl_service.snapshot import (
+    HEADER_FORMAT,
+    INDEX_FORMAT,
+    NO_VALUE,
+    RECORD_FORMAT,
+    SNAPSHOT_MAGIC,
+    STRING_FORMAT,
+    remove_ranking_snapshot,
+    write_ranking_snapshot,
+)
+
+
+class TestWriteRankingSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "rankings.snap")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_ranking_snapshot(self):
+        specializations_dfs = {
+            "Anxiety": [
+                json.dumps(
+                    {
+                        "councillor_id": 2909,
+                        "average_value": 5.0,
+                        "rating_count": 3,
+                        "decayed_value": 4.5,
+                        "language": "English",
+                        "availability": True,
+                    }
+                ),
+                json.dumps(
+                    {"councillor_id": 8887, "average_value": 4.0, "language": "English"}
+                ),
+            ],
+        }
+
+        write_ranking_snapshot(self.path, specializations_dfs)
+
+        with open(self.path, "rb") as snapshot_file:
+            content = snapshot_file.read()
+        header_size = struct.calcsize(HEADER_FORMAT)
+        index_size = struct.calcsize(INDEX_FORMAT)
+        record_size = struct.calcsize(RECORD_FORMAT)
+        strings_offset = header_size + index_size + 2 * record_size
+        self.assertEqual(
+            struct.unpack_from(HEADER_FORMAT, content),
+            (SNAPSHOT_MAGIC, 1, strings_offset, 2),
+        )
+        name, offset, records = struct.unpack_from(INDEX_FORMAT, content, header_size)
+        self.assertEqual((name.rstrip(b"\0"), records), (b"Anxiety", 2))
+        self.assertEqual(
+            struct.unpack_from(RECORD_FORMAT, content, offset), (2909, 5.0, 4.5, 3, 0, 1)
+        )
+        (
+            councillor_id,
+            average_value,
+            decayed_value,
+            rating_count,
+            *codes,
+        ) = struct.unpack_from(RECORD_FORMAT, content, offset + record_size)
+        self.assertEqual((councillor_id, average_value, rating_count), (8887, 4.0, 0))
+        self.assertEqual(codes, [0, NO_VALUE])
+        self.assertTrue(math.isnan(decayed_value))
+        self.assertEqual(struct.unpack_from(STRING_FORMAT, content, strings_offset), (9,))
+        self.assertEqual(
+            content[strings_offset + struct.calcsize(STRING_FORMAT) :],
+            b'"English"' + struct.pack(STRING_FORMAT, 4) + b"true",
+        )
+
+    def test_write_ranking_snapshot_replaces_file(self):
+        write_ranking_snapshot(self.path, {"Anxiety": []})
+        write_ranking_snapshot(self.path, {})
+
+        self.assertEqual(os.listdir(self.directory.name), ["rankings.snap"])
+        self.assertEqual(
+            os.path.getsize(self.path), struct.calcsize(HEADER_FORMAT)
+        )
+
+    def test_write_ranking_snapshot_long_specialization(self):
+        with self.assertRaises(ValueError):
+            write_ranking_snapshot(self.path, {"x" * 65: []})
+
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_remove_ranking_snapshot(self):
+        write_ranking_snapshot(self.path, {"Anxiety": []})
+
+        self.assertTrue(remove_ranking_snapshot(self.path))
+        self.assertFalse(remove_ranking_snapshot(self.path))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
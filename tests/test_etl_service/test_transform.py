@@ -1,4 +1,6 @@
 import json
+import math
+import tempfile
 import unittest
 from unittest import TestCase
 from unittest.mock import Mock, patch
@@ -8,10 +10,39 @@ import requests
 from pyspark.sql import SparkSession
 from pyspark.sql.types import DoubleType, StringType, StructField, StructType
 
-from src.etl_service.transform import data_transformations, fetch_all_data
+import extract
+from src.etl_service.decay import DECAY_RATE, WATERMARK_LOOKBACK_SECONDS, empty_decay_state
+from src.etl_service.transform import (
+    councillor_ratings,
+    data_transformations,
+    decayed_rating_increments,
+    fetch_all_data,
+    validated_dataframes,
+)
 
+JOINED_SCHEMA = (
+    "councillor_id long, specialization string, value double, rating_id long, rated_at long"
+)
 
+
+# transform imports the extract module by its bare name, so it is patched under that name. Failing
+# requests are not retried and no payload cached by another run can be reused.
+@patch("extract.time.sleep", Mock())
 class TestDataFetching(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.patchers = [
+            patch.object(extract, "EXTRACT_CACHE_DIR", self.cache_dir.name),
+            patch.dict(extract.retry_budgets, dict.fromkeys(extract.urls, 0)),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.cache_dir.cleanup()
+
     def test_fetch_all_data(self):
         # Mock the get_api_data function
         mock_get_api_data = Mock(
@@ -243,6 +274,117 @@ class TestDataFetching(TestCase):
         # Call the data_transformations() function
         joined_data = fetch_all_data(joined_data)
 
+    def test_validated_dataframes(self):
+        spark = SparkSession.builder.getOrCreate()
+        dataframes = {
+            "appointment": spark.createDataFrame(
+                [(1, 10, "note"), (1, 10, "note"), (2, None, "note")],
+                "id long, patient_id long, notes string",
+            ),
+            "councillor": spark.createDataFrame(
+                [(100, "Anxiety"), (101, None)], "id long, specialization string"
+            ),
+            "patient_councillor": spark.createDataFrame(
+                [(10, 100), (10, 100), (11, 999)], "patient_id long, councillor_id long"
+            ),
+            "rating": spark.createDataFrame(
+                [
+                    (1, 1, "4", "2023-01-02 00:00:00"),
+                    (1, 1, "2", "2023-01-01 00:00:00"),
+                    (2, 1, None, None),
+                    (3, 1, "n/a", None),
+                    (4, 1, "3", "2023-01-01 00:00:00"),
+                    (4, 1, "n/a", "2023-01-02 00:00:00"),
+                    (None, 1, "5", None),
+                    (None, 1, "1", None),
+                ],
+                "id long, appointment_id long, value string, created_at string",
+            ),
+        }
+
+        validated, discarded = validated_dataframes(dataframes)
+
+        self.assertEqual(
+            discarded,
+            {"appointment": 2, "councillor": 1, "patient_councillor": 2, "rating": 6},
+        )
+        self.assertEqual(validated["appointment"].columns, ["id", "patient_id"])
+        self.assertEqual(
+            [row.asDict() for row in validated["patient_councillor"].collect()],
+            [{"patient_id": 10, "councillor_id": 100}],
+        )
+        self.assertEqual(
+            sorted((row["id"], row["value"]) for row in validated["rating"].collect()),
+            [(1, 4.0), (4, 3.0)],
+        )
+
+
+class TestDecayedRatings(TestCase):
+    def setUp(self):
+        self.spark = SparkSession.builder.getOrCreate()
+
+    def test_decayed_rating_increments_folds_unseen_ratings(self):
+        joined_df = self.spark.createDataFrame(
+            [
+                (7, "Anxiety", 4.0, 1, 1000),  # already folded
+                (7, "Anxiety", 2.0, 2, 1000),  # same second as the watermark
+                (7, "Anxiety", 5.0, 3, 990),  # late
+                (7, "Anxiety", 3.0, 4, 999 - int(WATERMARK_LOOKBACK_SECONDS)),  # too late
+                (8, "Anxiety", 1.0, 5, None),
+            ],
+            JOINED_SCHEMA,
+        )
+        decay_state = {**empty_decay_state(), "watermark": 1000, "recent_ratings": [1]}
+
+        increments, latest_rating, recent_ratings = decayed_rating_increments(
+            joined_df, decay_state, 1000.0
+        )
+
+        late_weight = math.exp(-DECAY_RATE * 10)
+        self.assertEqual(set(increments), {7})
+        decayed_sum, decayed_weight = increments[7]
+        self.assertAlmostEqual(decayed_sum, 2.0 + 5.0 * late_weight)
+        self.assertAlmostEqual(decayed_weight, 1.0 + late_weight)
+        self.assertEqual(latest_rating, 1000)
+        self.assertEqual(recent_ratings, [1, 2, 3])
+
+    def test_decayed_rating_increments_without_recent_ratings(self):
+        joined_df = self.spark.createDataFrame(
+            [(7, "Anxiety", 4.0, 1, 1000), (7, "Anxiety", 2.0, 2, 990)], JOINED_SCHEMA
+        )
+        decay_state = {"as_of": 1000.0, "watermark": 1000, "councillors": {}}
+
+        increments, latest_rating, recent_ratings = decayed_rating_increments(
+            joined_df, decay_state, 1000.0
+        )
+
+        self.assertEqual((increments, latest_rating), ({}, None))
+        self.assertEqual(recent_ratings, [1, 2])
+
+    @patch("src.etl_service.transform.joined_data")
+    def test_councillor_ratings(self, mock_joined_data):
+        mock_joined_data.return_value = self.spark.createDataFrame(
+            [
+                (7, "Anxiety", 4.0, 1, 1_700_000_000),
+                (7, "Anxiety", 2.0, 2, 1_700_000_000),
+                (8, "Anxiety", 5.0, 3, None),
+            ],
+            JOINED_SCHEMA,
+        )
+        decay_state = empty_decay_state()
+
+        ratings_df = councillor_ratings(self.spark, decay_state)
+
+        rows = {row["councillor_id"]: row.asDict() for row in ratings_df.collect()}
+        self.assertEqual(rows[7]["average_value"], 3.0)
+        self.assertEqual(rows[7]["rating_count"], 2)
+        self.assertAlmostEqual(rows[7]["decayed_value"], 3.0)
+        self.assertEqual(rows[8]["rating_count"], 1)
+        self.assertIsNone(rows[8]["decayed_value"])
+        self.assertEqual(decay_state["watermark"], 1_700_000_000)
+        self.assertEqual(decay_state["recent_ratings"], [1, 2])
+        self.assertEqual(set(decay_state["councillors"]), {"7"})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from src.matching_service.indexes import build_ranking_index, filter_ranking
+
+RANKING = [
+    {"councillor_id": 1, "language": "English", "availability": True, "rating_count": 9},
+    {"councillor_id": 2, "language": "Urdu", "availability": True, "rating_count": 4},
+    {"councillor_id": 3, "language": "English", "availability": False, "rating_count": 7},
+    {"councillor_id": 4, "language": "english", "availability": True, "rating_count": 1},
+    {"councillor_id": 5, "rating_count": 3},
+]
+
+
+class RankingIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = build_ranking_index(RANKING)
+
+    def test_build_ranking_index(self):
+        self.assertEqual(self.index["language"], {"english": 0b1101, "urdu": 0b10})
+        self.assertEqual(self.index["availability"], {"true": 0b1011, "false": 0b100})
+        self.assertEqual(
+            self.index["rating_count"],
+            ([1, 3, 4, 7, 9], [0b11111, 0b10111, 0b00111, 0b00101, 0b00001]),
+        )
+
+    def test_filter_ranking_without_filters(self):
+        result = filter_ranking(RANKING, self.index, {}, number_of_councillors=2)
+
+        self.assertEqual(result, RANKING[:2])
+
+    def test_filter_ranking_intersects_filters_in_rank_order(self):
+        result = filter_ranking(
+            RANKING, self.index, {"language": "ENGLISH", "availability": "true"}
+        )
+
+        self.assertEqual([item["councillor_id"] for item in result], [1, 4])
+
+    def test_filter_ranking_min_rating_count_and_limit(self):
+        result = filter_ranking(
+            RANKING,
+            self.index,
+            {"language": "english"},
+            min_rating_count=5,
+            number_of_councillors=1,
+        )
+
+        self.assertEqual([item["councillor_id"] for item in result], [1])
+
+    def test_filter_ranking_min_rating_count_between_thresholds(self):
+        result = filter_ranking(RANKING, self.index, {}, min_rating_count=5)
+
+        self.assertEqual([item["councillor_id"] for item in result], [1, 3])
+
+    def test_filter_ranking_min_rating_count_above_maximum(self):
+        self.assertEqual(filter_ranking(RANKING, self.index, {}, min_rating_count=10), [])
+
+    def test_filter_ranking_unknown_value(self):
+        self.assertEqual(filter_ranking(RANKING, self.index, {"language": "French"}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,8 @@ from unittest.mock import patch
 
 from fastapi.testclient import TestClient
 
-from src.matching_service.main import app
+from resilience import CircuitOpenError
+from src.matching_service.main import WARM_UP_TIMEOUT, app, ready
 
 
 class TestCouncillors(unittest.TestCase):
@@ -36,6 +37,72 @@ class TestCouncillors(unittest.TestCase):
         self.assertEqual(response.json(), sample_result)
         mock_matching_councillors.assert_called_once_with(123, 2)
 
+    @patch("src.matching_service.main.search_councillors")
+    def test_get_filtered_councillors(self, mock_search_councillors):
+        sample_result = [{"councillor_id": 2909, "average_value": 5}]
+        mock_search_councillors.return_value = sample_result
+        response = self.client.get(
+            "/councillors/123/search?language=English&min_rating_count=3"
+            "&number_of_councillors=5"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sample_result)
+        mock_search_councillors.assert_called_once_with(
+            123, {"language": "English"}, 3, 5
+        )
+
+    @patch("src.matching_service.main.paginate_councillors")
+    def test_get_councillors_page(self, mock_paginate_councillors):
+        sample_result = {
+            "councillors": [{"councillor_id": 2909, "average_value": 5}],
+            "next_cursor": 16,
+        }
+        mock_paginate_councillors.return_value = sample_result
+        response = self.client.get("/councillors/123/page?cursor=15&page_size=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sample_result)
+        mock_paginate_councillors.assert_called_once_with(123, 15, 1)
+
+    def test_get_councillors_page_invalid_cursor(self):
+        response = self.client.get("/councillors/123/page?cursor=-1")
+        self.assertEqual(response.status_code, 422)
+
+    @patch("src.matching_service.main.matching_councillors")
+    def test_get_councillors_circuit_open(self, mock_matching_councillors):
+        mock_matching_councillors.side_effect = CircuitOpenError("Circuit report is open")
+        response = self.client.get("/councillors/123/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"detail": "Circuit report is open"})
+
+    @patch("src.matching_service.main.listen_for_ranking_changes")
+    @patch("src.matching_service.main.warm_up_until_ready")
+    def test_lifespan_warms_up_before_serving(
+        self, mock_warm_up_until_ready, mock_listen_for_ranking_changes
+    ):
+        def warm_up_until_ready(ready, stop, timeout=None):
+            ready.set()
+            return True
+
+        mock_warm_up_until_ready.side_effect = warm_up_until_ready
+
+        with TestClient(app) as client:
+            response = client.get("/ready")
+
+        self.assertEqual(response.status_code, 200)
+        mock_warm_up_until_ready.assert_called_once()
+        self.assertEqual(mock_warm_up_until_ready.call_args.args[2], WARM_UP_TIMEOUT)
+        ready.clear()
+
+    def test_get_readiness(self):
+        ready.clear()
+        self.assertEqual(self.client.get("/ready").status_code, 503)
+
+        ready.set()
+        response = self.client.get("/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"ready": True})
+        ready.clear()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,18 +1,39 @@
 import json
 import os
+import threading
 import unittest
 from unittest import mock
 from unittest.mock import MagicMock, patch
 
 from requests import HTTPError
 
-from src.matching_service.matching import get_report_category, matching_councillors
+from resilience import CircuitOpenError
+from src.matching_service import matching
+from src.matching_service.matching import (
+    cached_report_category,
+    get_ranking,
+    get_report_category,
+    matching_councillors,
+    paginate_councillors,
+    search_councillors,
+)
 
 
 class MatchingCouncillorsTestCase(unittest.TestCase):
-    @mock.patch("src.matching_service.matching.requests.get")
+    def setUp(self):
+        for cache in (
+            matching.report_category_cache,
+            matching.ranking_page_cache,
+            matching.ranking_cache,
+        ):
+            cache.invalidate()
+        matching.report_breaker.reset()
+        matching.redis_breaker.reset()
+
+    @mock.patch("src.matching_service.matching.get_report_session")
     @mock.patch("src.matching_service.matching.logger")
-    def test_get_report_category_successful(self, mock_logger, mock_get):
+    def test_get_report_category_successful(self, mock_logger, mock_get_report_session):
+        mock_get = mock_get_report_session.return_value.get
         mock_response = mock.Mock()
         mock_response.json.return_value = {"category": "example_category"}
         mock_get.return_value = mock_response
@@ -22,9 +43,10 @@ class MatchingCouncillorsTestCase(unittest.TestCase):
         self.assertEqual(result, "example_category")
         mock_logger.info.assert_called_once_with("Report Category received.")
 
-    @mock.patch("src.matching_service.matching.requests.get")
+    @mock.patch("src.matching_service.matching.get_report_session")
     @mock.patch("src.matching_service.matching.logger")
-    def test_get_report_category_error(self, mock_logger, mock_get):
+    def test_get_report_category_error(self, mock_logger, mock_get_report_session):
+        mock_get = mock_get_report_session.return_value.get
         mock_response = mock.Mock()
         mock_response.raise_for_status.side_effect = HTTPError("Test error")
         mock_response.url = f"{os.getenv('BASE_URL')}/report/123"
@@ -40,8 +62,9 @@ class MatchingCouncillorsTestCase(unittest.TestCase):
             f"Error 500 occurred while getting {expected_url}"
         )
 
-    @mock.patch("src.matching_service.matching.requests.get")
-    def test_get_report_category_response_data(self, mock_get):
+    @mock.patch("src.matching_service.matching.get_report_session")
+    def test_get_report_category_response_data(self, mock_get_report_session):
+        mock_get = mock_get_report_session.return_value.get
         mock_response = mock.Mock()
         mock_response.json.return_value = {"category": "example_category"}
         mock_get.return_value = mock_response
@@ -52,36 +75,28 @@ class MatchingCouncillorsTestCase(unittest.TestCase):
 
     @patch("src.matching_service.matching.get_report_category")
     @patch("src.matching_service.matching.get_redis_client")
-    @patch("json.loads")
     def test_matching_councillors_success(
-        self, mock_json_loads, mock_get_redis_client, mock_get_report_category
+        self, mock_get_redis_client, mock_get_report_category
     ):
         mock_get_report_category.return_value = "some_category"
         mock_redis_client = MagicMock()
-        mock_redis_client.get.return_value = [
-            {"councillor_id": 8887, "average_value": 5},
-            {"councillor_id": 2909, "average_value": 5},
+        mock_redis_client.lrange.return_value = [
+            json.dumps({"councillor_id": 8887, "average_value": 5}),
+            json.dumps({"councillor_id": 2909, "average_value": 5}),
         ]
 
         mock_get_redis_client.return_value = mock_redis_client
 
-        mock_json_loads.return_value = [
-            {"councillor_id": 8887, "average_value": 5},
-            {"councillor_id": 2909, "average_value": 5},
-        ]
-
         result = matching_councillors(12345, 2)
-        print(result)
         expected_result = [
             {"councillor_id": 8887, "average_value": 5},
             {"councillor_id": 2909, "average_value": 5},
         ]
-        print(expected_result)
 
-        self.assertEqual(*result, expected_result)
+        self.assertEqual(result, expected_result)
         mock_get_report_category.assert_called_once_with(12345)
         mock_get_redis_client.assert_called_once()
-        mock_redis_client.get.assert_called_once_with("some_category")
+        mock_redis_client.lrange.assert_called_once_with("ranking:some_category", 0, 1)
 
     @patch("src.matching_service.matching.get_report_category")
     @patch("src.matching_service.matching.json.loads")
@@ -108,9 +123,7 @@ class MatchingCouncillorsTestCase(unittest.TestCase):
     ):
         mock_get_report_category.return_value = "some_category"
         mock_redis_client = MagicMock()
-        mock_redis_client.get.return_value = (
-            "[]"  # Valid JSON string representing an empty list
-        )
+        mock_redis_client.lrange.return_value = []
         mock_get_redis_client.return_value = mock_redis_client
 
         mock_logger = MagicMock()
@@ -126,9 +139,216 @@ class MatchingCouncillorsTestCase(unittest.TestCase):
 
             mock_get_report_category.assert_called_once_with(12345)
             mock_get_redis_client.assert_called_once()
-            mock_redis_client.get.assert_called_once_with("some_category")
+            mock_redis_client.lrange.assert_called_once_with(
+                "ranking:some_category", 0, 1
+            )
             mock_logger.info.assert_called_once_with("Returning top councillors")
 
+    @patch("src.matching_service.matching.get_redis_client")
+    def test_get_ranking_is_cached(self, mock_get_redis_client):
+        mock_get_redis_client.return_value.get.return_value = json.dumps(
+            [json.dumps({"councillor_id": 8887, "language": "English"})]
+        )
+
+        ranking, index = get_ranking("some_category")
+        self.assertEqual(get_ranking("some_category"), (ranking, index))
+
+        self.assertEqual(ranking, [{"councillor_id": 8887, "language": "English"}])
+        self.assertEqual(index["language"], {"english": 1})
+        mock_get_redis_client.return_value.get.assert_called_once_with("some_category")
+
+    @patch("src.matching_service.matching.get_report_category")
+    @patch("src.matching_service.matching.get_ranking")
+    def test_search_councillors(self, mock_get_ranking, mock_get_report_category):
+        mock_get_report_category.return_value = "some_category"
+        ranking = [
+            {"councillor_id": 8887, "language": "Urdu", "rating_count": 4},
+            {"councillor_id": 2909, "language": "English", "rating_count": 2},
+        ]
+        mock_get_ranking.return_value = (
+            ranking,
+            {"language": {"english": 0b10}, "rating_count": ([2, 4], [0b11, 0b01])},
+        )
+
+        result = search_councillors(12345, {"language": "English"}, 1, 5)
+
+        self.assertEqual(result, [ranking[1]])
+        mock_get_ranking.assert_called_once_with("some_category")
+
+    @patch("src.matching_service.matching.get_report_category")
+    @patch("src.matching_service.matching.get_redis_client")
+    def test_paginate_councillors(self, mock_get_redis_client, mock_get_report_category):
+        mock_get_report_category.return_value = "some_category"
+        mock_redis_client = mock_get_redis_client.return_value
+        mock_redis_client.lrange.return_value = [
+            json.dumps({"councillor_id": councillor_id}) for councillor_id in (3, 4, 5)
+        ]
+
+        result = paginate_councillors(12345, cursor=2, page_size=2)
+
+        self.assertEqual(
+            result,
+            {"councillors": [{"councillor_id": 3}, {"councillor_id": 4}], "next_cursor": 4},
+        )
+        mock_redis_client.lrange.assert_called_once_with("ranking:some_category", 2, 4)
+
+    @patch("src.matching_service.matching.get_report_category")
+    @patch("src.matching_service.matching.get_redis_client")
+    def test_paginate_councillors_last_page(
+        self, mock_get_redis_client, mock_get_report_category
+    ):
+        mock_get_report_category.return_value = "some_category"
+        mock_get_redis_client.return_value.lrange.return_value = [
+            json.dumps({"councillor_id": 5})
+        ]
+
+        result = paginate_councillors(12345, cursor=4, page_size=2)
+
+        self.assertEqual(result, {"councillors": [{"councillor_id": 5}], "next_cursor": None})
+
+    @patch("src.matching_service.matching.get_report_category")
+    def test_cached_report_category(self, mock_get_report_category):
+        mock_get_report_category.return_value = "some_category"
+
+        self.assertEqual(cached_report_category(12345), "some_category")
+        self.assertEqual(cached_report_category(12345), "some_category")
+
+        mock_get_report_category.assert_called_once_with(12345)
+
+    @patch("src.matching_service.matching.get_report_category")
+    def test_cached_report_category_opens_circuit(self, mock_get_report_category):
+        mock_get_report_category.side_effect = HTTPError(
+            "Test error", response=mock.Mock(status_code=500)
+        )
+
+        for _ in range(matching.CIRCUIT_FAILURE_THRESHOLD):
+            with self.assertRaises(HTTPError):
+                cached_report_category(12345)
+        with self.assertRaises(CircuitOpenError):
+            cached_report_category(12345)
+
+        self.assertEqual(
+            mock_get_report_category.call_count, matching.CIRCUIT_FAILURE_THRESHOLD
+        )
+
+    @patch("src.matching_service.matching.get_report_category")
+    def test_cached_report_category_not_found_keeps_circuit_closed(
+        self, mock_get_report_category
+    ):
+        mock_get_report_category.side_effect = HTTPError(
+            "Not found", response=mock.Mock(status_code=404)
+        )
+
+        for _ in range(matching.CIRCUIT_FAILURE_THRESHOLD + 1):
+            with self.assertRaises(HTTPError):
+                cached_report_category(12345)
+
+        self.assertFalse(matching.report_breaker.is_open)
+        self.assertEqual(
+            mock_get_report_category.call_count, matching.CIRCUIT_FAILURE_THRESHOLD + 1
+        )
+
+    def test_invalidate_ranking(self):
+        for category in ("some_category", "other_category"):
+            matching.ranking_cache.get(category, lambda: ([], {}))
+            matching.ranking_page_cache.get((category, 0, 15), lambda: [])
+
+        matching.invalidate_ranking("some_category")
+
+        self.assertEqual(
+            matching.ranking_cache.get("some_category", lambda: (["new"], {})),
+            (["new"], {}),
+        )
+        self.assertEqual(
+            matching.ranking_page_cache.get(("some_category", 0, 15), lambda: ["new"]),
+            ["new"],
+        )
+        self.assertEqual(
+            matching.ranking_page_cache.get(("other_category", 0, 15), lambda: ["new"]),
+            [],
+        )
+
+    @patch("src.matching_service.matching.invalidate_ranking")
+    @patch("src.matching_service.matching.get_redis_client")
+    def test_listen_for_ranking_changes(
+        self, mock_get_redis_client, mock_invalidate_ranking
+    ):
+        stop = threading.Event()
+        pubsub = mock_get_redis_client.return_value.pubsub.return_value
+
+        def get_message(timeout):
+            if pubsub.get_message.call_count == 2:
+                stop.set()
+                return None
+            return {"type": "message", "data": b"some_category"}
+
+        pubsub.get_message.side_effect = get_message
+
+        matching.listen_for_ranking_changes(stop)
+
+        pubsub.subscribe.assert_called_once_with("rankings:changes")
+        mock_invalidate_ranking.assert_called_once_with("some_category")
+        pubsub.close.assert_called_once()
+
+    @patch("src.matching_service.matching.get_redis_client")
+    @patch("src.matching_service.matching.current_snapshot")
+    @patch("src.matching_service.matching.RANKING_SNAPSHOT_PATH", "rankings.snap")
+    def test_get_ranking_page_from_snapshot(
+        self, mock_current_snapshot, mock_get_redis_client
+    ):
+        mock_current_snapshot.return_value.page.return_value = [{"councillor_id": 8887}]
+
+        result = matching.get_ranking_page("some_category", 15, 5)
+
+        self.assertEqual(result, [{"councillor_id": 8887}])
+        mock_current_snapshot.assert_called_once_with("rankings.snap")
+        mock_current_snapshot.return_value.page.assert_called_once_with(
+            "some_category", 15, 5
+        )
+        mock_get_redis_client.assert_not_called()
+
+    @patch("src.matching_service.matching.get_report_session")
+    @patch("src.matching_service.matching.get_redis_client")
+    def test_warm_up(self, mock_get_redis_client, mock_get_report_session):
+        mock_redis_client = mock_get_redis_client.return_value
+        mock_redis_client.scan_iter.return_value = [b"ranking:some_category"]
+        mock_redis_client.lrange.return_value = [json.dumps({"councillor_id": 8887})]
+
+        matching.warm_up(5)
+
+        mock_redis_client.ping.assert_called_once()
+        mock_redis_client.lrange.assert_called_once_with("ranking:some_category", 0, 4)
+        mock_get_report_session.return_value.head.assert_called_once()
+        self.assertEqual(
+            matching.get_ranking_page("some_category", 0, 5), [{"councillor_id": 8887}]
+        )
+        mock_redis_client.lrange.assert_called_once()
+
+    @patch("src.matching_service.matching.warm_up")
+    def test_warm_up_until_ready_retries(self, mock_warm_up):
+        mock_warm_up.side_effect = [ConnectionError("Redis is down"), None]
+        ready, stop = threading.Event(), mock.Mock()
+        stop.is_set.return_value = False
+
+        self.assertTrue(matching.warm_up_until_ready(ready, stop))
+
+        self.assertTrue(ready.is_set())
+        self.assertEqual(mock_warm_up.call_count, 2)
+        stop.wait.assert_called_once()
+
+    @patch("src.matching_service.matching.RECONNECT_INTERVAL", 5)
+    @patch("src.matching_service.matching.warm_up")
+    def test_warm_up_until_ready_gives_up_after_timeout(self, mock_warm_up):
+        mock_warm_up.side_effect = ConnectionError("Redis is down")
+        ready, stop = threading.Event(), mock.Mock()
+        stop.is_set.return_value = False
+
+        self.assertFalse(matching.warm_up_until_ready(ready, stop, timeout=1))
+
+        self.assertFalse(ready.is_set())
+        mock_warm_up.assert_called_once()
+        stop.wait.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
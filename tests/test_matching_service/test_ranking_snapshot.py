@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.etl_service.snapshot import write_ranking_snapshot
+from src.matching_service import ranking_snapshot
+from src.matching_service.ranking_snapshot import RankingSnapshot, current_snapshot
+
+RANKINGS = {
+    "Anxiety": [
+        json.dumps(
+            {
+                "councillor_id": councillor_id,
+                "average_value": 5.0 - councillor_id,
+                "rating_count": councillor_id,
+                "language": "Urdu" if councillor_id % 2 else "English",
+                **({"availability": True} if councillor_id == 1 else {}),
+            }
+        )
+        for councillor_id in range(4)
+    ],
+}
+
+
+class RankingSnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "rankings.snap")
+        write_ranking_snapshot(self.path, RANKINGS)
+        ranking_snapshot._current.update(snapshot=None, checked_at=-float("inf"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_page(self):
+        result = RankingSnapshot(self.path).page("Anxiety", 1, 2)
+
+        self.assertEqual(
+            result,
+            [
+                {
+                    "councillor_id": 1,
+                    "average_value": 4.0,
+                    "rating_count": 1,
+                    "decayed_value": None,
+                    "language": "Urdu",
+                    "availability": True,
+                },
+                {
+                    "councillor_id": 2,
+                    "average_value": 3.0,
+                    "rating_count": 2,
+                    "decayed_value": None,
+                    "language": "English",
+                },
+            ],
+        )
+
+    def test_page_past_end_and_unknown_specialization(self):
+        ranking_snapshot = RankingSnapshot(self.path)
+
+        self.assertEqual(len(ranking_snapshot.page("Anxiety", 3, 15)), 1)
+        self.assertEqual(ranking_snapshot.page("Depression", 0, 15), [])
+
+    def test_invalid_file(self):
+        with open(self.path, "wb") as snapshot_file:
+            snapshot_file.write(b"\0" * 16)
+
+        with self.assertRaises(ValueError):
+            RankingSnapshot(self.path)
+
+    @patch("src.matching_service.ranking_snapshot.SNAPSHOT_CHECK_INTERVAL", 0)
+    def test_current_snapshot_reloads_replaced_file(self):
+        first = current_snapshot(self.path)
+        self.assertIs(current_snapshot(self.path), first)
+
+        write_ranking_snapshot(self.path, {"Depression": RANKINGS["Anxiety"][:1]})
+        second = current_snapshot(self.path)
+
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second.page("Depression", 0, 15)), 1)
+        self.assertEqual(len(first.page("Anxiety", 0, 15)), 4)
+
+    def test_current_snapshot_missing_file(self):
+        self.assertIsNone(current_snapshot(os.path.join(self.directory.name, "missing")))
+
+
+if __name__ == "__main__":
+    unittest.main()
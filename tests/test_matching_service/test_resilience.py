@@ -0,0 +1,154 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from src.matching_service.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    StaleWhileRevalidateCache,
+)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def test_opens_after_failure_threshold(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+        failing = Mock(side_effect=ConnectionError("down"))
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                breaker.call(failing)
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(failing)
+
+        self.assertTrue(breaker.is_open)
+        self.assertEqual(failing.call_count, 2)
+
+    def test_ignored_errors_do_not_open_circuit(self):
+        breaker = CircuitBreaker(
+            "test",
+            failure_threshold=2,
+            reset_timeout=30,
+            is_failure=lambda error: not isinstance(error, KeyError),
+        )
+        failing = Mock(side_effect=KeyError("unknown"))
+
+        for _ in range(3):
+            with self.assertRaises(KeyError):
+                breaker.call(failing)
+
+        self.assertFalse(breaker.is_open)
+        self.assertEqual(failing.call_count, 3)
+
+    @patch("src.matching_service.resilience.time.monotonic")
+    def test_trial_call_closes_circuit(self, mock_monotonic):
+        mock_monotonic.return_value = 0
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+        with self.assertRaises(ConnectionError):
+            breaker.call(Mock(side_effect=ConnectionError("down")))
+
+        mock_monotonic.return_value = 31
+        self.assertEqual(breaker.call(lambda value: value, "up"), "up")
+
+        self.assertFalse(breaker.is_open)
+
+
+class StaleWhileRevalidateCacheTestCase(unittest.TestCase):
+    def test_fresh_value_is_not_reloaded(self):
+        cache = StaleWhileRevalidateCache(ttl=60)
+        loader = Mock(return_value="value")
+
+        self.assertEqual(cache.get("key", loader), "value")
+        self.assertEqual(cache.get("key", loader), "value")
+
+        loader.assert_called_once()
+
+    def test_stale_value_is_served_while_refreshing(self):
+        cache = StaleWhileRevalidateCache(ttl=0)
+        cache.get("key", lambda: "old")
+        refreshed = threading.Event()
+
+        def loader():
+            refreshed.set()
+            return "new"
+
+        self.assertEqual(cache.get("key", loader), "old")
+        self.assertTrue(refreshed.wait(1))
+
+    def test_stale_value_is_served_when_reload_fails(self):
+        cache = StaleWhileRevalidateCache(ttl=0, stale_while_revalidate=False)
+        cache.get("key", lambda: "old")
+
+        result = cache.get("key", Mock(side_effect=TimeoutError("slow")))
+
+        self.assertEqual(result, "old")
+
+    def test_missing_value_failure_is_raised(self):
+        cache = StaleWhileRevalidateCache(ttl=60)
+
+        with self.assertRaises(TimeoutError):
+            cache.get("key", Mock(side_effect=TimeoutError("slow")))
+
+    def test_least_recently_used_value_is_dropped(self):
+        cache = StaleWhileRevalidateCache(ttl=60, maxsize=2)
+        cache.get("a", lambda: "old")
+        cache.get("b", lambda: "old")
+        cache.get("a", lambda: "new")
+
+        cache.get("c", lambda: "old")
+
+        self.assertEqual(cache.get("a", lambda: "new"), "old")
+        self.assertEqual(cache.get("b", lambda: "new"), "new")
+
+    def test_invalidate(self):
+        cache = StaleWhileRevalidateCache(ttl=60)
+        cache.get("key", lambda: "old")
+
+        cache.invalidate("key")
+
+        self.assertEqual(cache.get("key", lambda: "new"), "new")
+
+    def test_invalidate_if(self):
+        cache = StaleWhileRevalidateCache(ttl=60)
+        cache.get(("a", 0), lambda: "old")
+        cache.get(("b", 0), lambda: "old")
+
+        cache.invalidate_if(lambda key: key[0] == "a")
+
+        self.assertEqual(cache.get(("a", 0), lambda: "new"), "new")
+        self.assertEqual(cache.get(("b", 0), lambda: "new"), "old")
+
+    def test_invalidate_during_load_drops_loaded_value(self):
+        cache = StaleWhileRevalidateCache(ttl=60)
+
+        def loader():
+            cache.invalidate_if(lambda key: key == "key")
+            return "old"
+
+        self.assertEqual(cache.get("key", loader), "old")
+        self.assertEqual(cache.get("key", lambda: "new"), "new")
+
+    def test_stale_refresh_started_before_invalidate_is_not_stored(self):
+        cache = StaleWhileRevalidateCache(ttl=0)
+        cache.get("key", lambda: "old")
+        started, invalidated = threading.Event(), threading.Event()
+
+        def loader():
+            started.set()
+            invalidated.wait(1)
+            return "old"
+
+        self.assertEqual(cache.get("key", loader), "old")
+        self.assertTrue(started.wait(1))
+        cache.invalidate("key")
+        invalidated.set()
+        for _ in range(100):
+            if not cache._loading:  # the refresh is over
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(cache.get("key", lambda: "new"), "new")
+
+
+if __name__ == "__main__":
+    unittest.main()